@@ -1,6 +1,9 @@
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+# shared request_metrics package at the repository root
+sys.path.insert(0, str(BASE_DIR.parent.parent))
 SECRET_KEY = 'your-secret-key-here'
 DEBUG = True
 ALLOWED_HOSTS = []
@@ -16,6 +19,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'request_metrics.middleware.RequestMetricsMiddleware',
+    'request_metrics.profiler.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
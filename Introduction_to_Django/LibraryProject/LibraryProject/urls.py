@@ -1 +1,5 @@
+from django.urls import path, include
 
+urlpatterns = [
+    path('metrics/', include('request_metrics.urls')),
+]
@@ -1,3 +1,9 @@
+import sys
+from pathlib import Path
+
+# shared request_metrics package at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -13,6 +19,18 @@ INSTALLED_APPS = [
     "api",
 ]
 
+MIDDLEWARE = [
+    "request_metrics.middleware.RequestMetricsMiddleware",
+    "request_metrics.profiler.SamplingProfilerMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -6,4 +6,7 @@ urlpatterns = [
 
     # Include the API app routes
     path('api/', include('api.urls')),  # all endpoints from api/urls.py will be under /api/
+
+    # Prometheus metrics from request_metrics
+    path('metrics/', include('request_metrics.urls')),
 ]
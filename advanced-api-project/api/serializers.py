@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from request_metrics.drf import TimedSerializerMixin
 from .models import Author, Book
 from datetime import datetime
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Book model.
     Includes custom validation to prevent future publication years.
@@ -25,7 +26,7 @@ class BookSerializer(serializers.ModelSerializer):
         return value
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Author model.
     Includes a nested list of related books using BookSerializer.
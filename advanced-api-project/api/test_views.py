@@ -1,7 +1,9 @@
+from pathlib import Path
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
+from request_metrics.testing import QueryBudgetMixin
 from .models import Author, Book
 
 
@@ -111,3 +113,37 @@ class BookAPITestCase(APITestCase):
             {"title": "Test Book", "publication_year": 2000, "author": self.author.id},
         )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BookQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+    Query budgets for the book endpoints, checked against query_budgets.json
+    at the fixture size and at 10x the data (QUERY_BUDGET_UPDATE=1 re-records).
+    """
+    query_budget_file = Path(__file__).resolve().parent.parent / "query_budgets.json"
+
+    def setUp(self):
+        self.author = Author.objects.create(name="George Orwell")
+        self.add_books(1)
+
+    def add_books(self, factor):
+        # grow both the books and the authors they point to
+        authors = Author.objects.bulk_create([Author(name=f"Author {i}") for i in range(2 * factor)])
+        Book.objects.bulk_create([
+            Book(title=f"Book {Book.objects.count() + i}", publication_year=1950, author=authors[i % len(authors)])
+            for i in range(5 * factor)
+        ])
+
+    def test_book_list_query_budget(self):
+        self.assertQueryBudgetScales("BookListView", lambda: self.client.get(reverse("book-list")), self.add_books)
+
+    def test_book_list_search_query_budget(self):
+        self.assertQueryBudgetScales(
+            "BookListView?search", lambda: self.client.get(reverse("book-list"), {"search": "Book"}), self.add_books
+        )
+
+    def test_book_detail_query_budget(self):
+        book = Book.objects.first()
+        self.assertQueryBudgetScales(
+            "BookDetailView", lambda: self.client.get(reverse("book-detail", args=[book.id])), self.add_books
+        )
@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from request_metrics.drf import TimedSerializerMixin
 from .models import Book
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = '__all__'
@@ -0,0 +1,17 @@
+"""
+Per-request database and serialization cost for the Django projects in this
+repository.
+
+- ``middleware.RequestMetricsMiddleware`` records, for every request, the view,
+  query count, total SQL time, duplicated query fingerprints (N+1 patterns),
+  serializer time, response size and total duration. It reports them in a
+  ``Server-Timing`` header and aggregates them into in-process histograms.
+- ``drf.TimedSerializerMixin`` is the DRF hook that contributes serializer time.
+- ``urls`` exposes the histograms in Prometheus text format.
+- ``profiler.SamplingProfilerMiddleware`` stack-samples opted-in requests and
+  writes speedscope and collapsed-stack profiles with their SQL spans.
+- ``testing`` enforces per-endpoint query budgets in tests.
+
+Projects put the repository root on ``sys.path`` in their settings so the
+package can be shared without installing it.
+"""
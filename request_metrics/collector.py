@@ -0,0 +1,104 @@
+"""
+Context-local collection of the cost of the current request.
+
+A ``RequestMetrics`` is bound to a context variable for the duration of a
+request. Asynchronous views and ``sync_to_async`` calls inherit the context,
+and their database work is recorded as well. Background threads start
+without it, so their queries are never attributed to a request.
+"""
+import contextvars
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)", re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql):
+    """Collapse literals and IN lists so repeats of one statement compare equal."""
+    sql = _LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.fingerprints = Counter()
+        # set to a list by the profiler: (started, finished, fingerprint) per query
+        self.spans = None
+        self.active_sql = None
+
+    def duplicates(self, threshold):
+        """Fingerprints executed at least ``threshold`` times, most repeated first."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def current():
+    return _current.get()
+
+
+def start():
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(attribute):
+    """Add the duration of the block to ``attribute`` of the current request, if any."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, attribute, getattr(metrics, attribute) + time.perf_counter() - started)
+
+
+def _record(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    statement = fingerprint(sql)
+    if metrics.spans is not None:
+        metrics.active_sql = statement
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        finished = time.perf_counter()
+        metrics.queries += 1
+        metrics.sql_seconds += finished - started
+        metrics.fingerprints[statement] += 1
+        if metrics.spans is not None:
+            metrics.active_sql = None
+            metrics.spans.append((started, finished, statement))
+
+
+def _install(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def install():
+    """Instrument every database connection, now and whenever one is opened."""
+    connection_created.connect(_install, dispatch_uid="request_metrics")
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
@@ -0,0 +1,30 @@
+"""
+DRF hook: put ``TimedSerializerMixin`` first in a serializer's bases to count
+the time spent building ``serializer.data`` towards the request's serializer
+time. ``many=True`` instances are timed too. Nested serializers are covered
+by their parent's timing, so nothing is counted twice.
+"""
+from .collector import timed
+
+_timed_classes = {}
+
+
+class _TimedData:
+    @property
+    def data(self):
+        with timed("serializer_seconds"):
+            return super().data
+
+
+def _timed_class(cls):
+    if cls not in _timed_classes:
+        _timed_classes[cls] = type(f"Timed{cls.__name__}", (_TimedData, cls), {})
+    return _timed_classes[cls]
+
+
+class TimedSerializerMixin(_TimedData):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        serializer.__class__ = _timed_class(type(serializer))
+        return serializer
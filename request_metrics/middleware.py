@@ -0,0 +1,75 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import collector
+from .registry import registry
+
+logger = logging.getLogger("request_metrics")
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Place first in MIDDLEWARE so the timings cover the whole stack.
+
+    Settings: REQUEST_METRICS_SERVER_TIMING (send the Server-Timing header,
+    default True) and REQUEST_METRICS_DUPLICATE_THRESHOLD (how often one
+    statement may repeat before it is logged as an N+1 candidate, default 3).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "REQUEST_METRICS_SERVER_TIMING", True)
+        self.threshold = getattr(settings, "REQUEST_METRICS_DUPLICATE_THRESHOLD", 3)
+        collector.install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = collector.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            collector.stop(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = collector.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            collector.stop(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        # streamed bodies are not buffered just to be measured
+        size = None if response.streaming else len(response.content)
+        view = _view_name(request)
+        duplicates = metrics.duplicates(self.threshold)
+        for sql, count in duplicates:
+            logger.warning("%s ran the same query %d times: %s", view, count, sql[:500])
+        registry.record(
+            view, request.method, response.status_code, metrics, duration, size,
+            sum(count - 1 for _, count in duplicates),
+        )
+        if self.server_timing:
+            response["Server-Timing"] = ", ".join([
+                f'db;desc="{metrics.queries} queries";dur={metrics.sql_seconds * 1000:.2f}',
+                f"serializer;dur={metrics.serializer_seconds * 1000:.2f}",
+                f"total;dur={duration * 1000:.2f}",
+            ])
+        return response
@@ -0,0 +1,227 @@
+"""
+Opt-in sampling profiler for single requests.
+
+``SamplingProfilerMiddleware`` profiles a request when it carries
+``X-Profile: <REQUEST_PROFILER_TOKEN>``, or at random with probability
+REQUEST_PROFILER_RATE. A sampler thread reads the request thread's Python
+stack every REQUEST_PROFILER_INTERVAL seconds via ``sys._current_frames()``.
+Samples taken while a query runs end in a synthetic ``SQL: <statement>``
+frame, and every query is kept as a span as well.
+
+Each profile is written to REQUEST_PROFILER_DIR twice: a speedscope file
+(https://www.speedscope.app) holding the sampled stacks and the SQL spans, and
+a collapsed-stack file for flamegraph.pl and similar tools. Only the newest
+REQUEST_PROFILER_KEEP profiles are kept. The response names its profile in an
+``X-Profile-Id`` header.
+
+A request that is not sampled costs one header lookup and one random number.
+"""
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, get_random_string
+
+from . import collector
+from .middleware import _view_name
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of ``thread_id`` until stopped, up to ``root_frame``."""
+
+    def __init__(self, thread_id, root_frame, metrics, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id, self.root_frame = thread_id, root_frame
+        self.metrics, self.interval = metrics, interval
+        self.samples = []  # (timestamp, stack from the root, innermost last)
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None and frame is not self.root_frame:
+                code = frame.f_code
+                stack.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            sql = self.metrics.active_sql
+            if sql is not None:
+                stack.append((f"SQL: {sql[:200]}", "", 0))
+            self.samples.append((time.perf_counter(), tuple(stack)))
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, name, started, finished, samples, spans):
+        self.name, self.started, self.finished = name, started, finished
+        self.samples, self.spans = samples, spans
+
+    def weighted_stacks(self):
+        """Each sample weighted by the time since the previous one."""
+        previous = self.started
+        for timestamp, stack in self.samples:
+            yield stack, timestamp - previous
+            previous = timestamp
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format, weights in microseconds."""
+        totals = Counter()
+        for stack, weight in self.weighted_stacks():
+            if stack:
+                totals[";".join(name.replace(";", ":") for name, _, _ in stack)] += weight
+        return "".join(f"{stack} {round(weight * 1e6)}\n" for stack, weight in totals.most_common())
+
+    def speedscope(self):
+        frames, index = [], {}
+
+        def frame_id(frame):
+            if frame not in index:
+                name, filename, line = frame
+                index[frame] = len(frames)
+                frames.append({"name": name, "file": filename, "line": line} if filename else {"name": name})
+            return index[frame]
+
+        samples, weights = [], []
+        for stack, weight in self.weighted_stacks():
+            samples.append([frame_id(frame) for frame in stack])
+            weights.append(weight)
+        events = []
+        for started, finished, sql in self.spans:
+            sql_frame = frame_id((f"SQL: {sql[:200]}", "", 0))
+            events.append({"type": "O", "frame": sql_frame, "at": started - self.started})
+            events.append({"type": "C", "frame": sql_frame, "at": finished - self.started})
+        end = self.finished - self.started
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "request_metrics",
+            "shared": {"frames": frames},
+            "profiles": [
+                {"type": "sampled", "name": f"{self.name} (Python)", "unit": "seconds",
+                 "startValue": 0, "endValue": end, "samples": samples, "weights": weights},
+                {"type": "evented", "name": f"{self.name} (SQL)", "unit": "seconds",
+                 "startValue": 0, "endValue": end, "events": events},
+            ],
+        }
+
+    def save(self, directory, profile_id, keep):
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"{profile_id}.collapsed").write_text(self.collapsed())
+        with open(directory / f"{profile_id}.speedscope.json", "w") as fh:
+            json.dump(self.speedscope(), fh)
+        rotate(directory, keep)
+
+
+def rotate(directory, keep):
+    """Delete all but the newest ``keep`` profiles."""
+    profiles = sorted(directory.glob("*.speedscope.json"), key=lambda path: path.stat().st_mtime_ns)
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        profile_id = path.name[:-len(".speedscope.json")]
+        for suffix in (".speedscope.json", ".collapsed"):
+            try:
+                os.remove(directory / f"{profile_id}{suffix}")
+            except FileNotFoundError:
+                pass
+
+
+class SamplingProfilerMiddleware:
+    """
+    Place right after RequestMetricsMiddleware. Settings:
+    REQUEST_PROFILER_TOKEN (``X-Profile`` header value that triggers a profile;
+    empty disables the header), REQUEST_PROFILER_RATE (fraction of requests to
+    profile, default 0), REQUEST_PROFILER_INTERVAL (seconds between samples,
+    default 0.005), REQUEST_PROFILER_DIR and REQUEST_PROFILER_KEEP (default 100).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.token = getattr(settings, "REQUEST_PROFILER_TOKEN", "")
+        self.rate = getattr(settings, "REQUEST_PROFILER_RATE", 0)
+        self.interval = getattr(settings, "REQUEST_PROFILER_INTERVAL", 0.005)
+        self.directory = Path(getattr(
+            settings, "REQUEST_PROFILER_DIR", Path(tempfile.gettempdir()) / "request-profiles"
+        ))
+        self.keep = getattr(settings, "REQUEST_PROFILER_KEEP", 100)
+        collector.install()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def should_profile(self, request):
+        header = request.headers.get("X-Profile")
+        if header is not None and self.token and constant_time_compare(header, self.token):
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+        run = self.begin(sys._getframe())
+        try:
+            response = self.get_response(request)
+        finally:
+            profile = self.end(request, *run)
+        return self.save(profile, response)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+        # samples the event loop thread, so other tasks may show up in them
+        run = self.begin(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile = self.end(request, *run)
+        return self.save(profile, response)
+
+    def begin(self, root_frame):
+        metrics, token = collector.current(), None
+        if metrics is None:
+            metrics, token = collector.start()
+        metrics.spans = []
+        sampler = Sampler(threading.get_ident(), root_frame, metrics, self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        return metrics, token, sampler, started
+
+    def end(self, request, metrics, token, sampler, started):
+        sampler.stop()
+        finished = time.perf_counter()
+        spans, metrics.spans = metrics.spans, None
+        if token is not None:
+            collector.stop(token)
+        view = _view_name(request)
+        profile = Profile(f"{request.method} {request.path} ({view})", started, finished, sampler.samples, spans)
+        profile.view = view
+        return profile
+
+    def save(self, profile, response):
+        profile_id = "{}-{}-{}".format(
+            time.strftime("%Y%m%dT%H%M%S"), _UNSAFE.sub("_", profile.view), get_random_string(6)
+        )
+        profile.save(self.directory, profile_id, self.keep)
+        response["X-Profile-Id"] = profile_id
+        return response
@@ -0,0 +1,105 @@
+"""
+In-process metric aggregation rendered in the Prometheus text format.
+
+Each worker process keeps its own registry; scrape every process (or put
+them behind one target per process) and let Prometheus sum the series.
+"""
+import bisect
+import threading
+from collections import defaultdict
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name, self.help_text = name, help_text
+        self._values = defaultdict(float)
+
+    def inc(self, labels, amount=1):
+        self._values[labels] += amount
+
+    def samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield self.name, labels, value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        self.name, self.help_text, self.buckets = name, help_text, buckets
+        # per label set: [count per bucket..., +Inf count], sum
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, labels, value):
+        counts = self._counts.setdefault(labels, [0] * (len(self.buckets) + 1))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def samples(self):
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", bound),), cumulative
+            yield f"{self.name}_sum", labels, self._sums[labels]
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter("django_requests_total", "Requests by view, method and status code.")
+        self.duplicates = Counter(
+            "django_request_duplicate_queries_total",
+            "Queries repeating a statement already run in the same request (N+1 candidates).",
+        )
+        self.duration = Histogram("django_request_duration_seconds", "Total request time.", DURATION_BUCKETS)
+        self.queries = Histogram("django_request_queries", "Database queries per request.", QUERY_BUCKETS)
+        self.sql = Histogram("django_request_sql_seconds", "Time spent in SQL per request.", DURATION_BUCKETS)
+        self.serializer = Histogram(
+            "django_request_serializer_seconds", "Time spent in DRF serializers per request.", DURATION_BUCKETS
+        )
+        self.size = Histogram("django_response_size_bytes", "Response body size.", SIZE_BUCKETS)
+
+    def record(self, view, method, status, metrics, duration, size, duplicated):
+        labels = (("view", view), ("method", method))
+        with self._lock:
+            self.requests.inc(labels + (("status", status),))
+            if duplicated:
+                self.duplicates.inc(labels, duplicated)
+            self.duration.observe(labels, duration)
+            self.queries.observe(labels, metrics.queries)
+            self.sql.observe(labels, metrics.sql_seconds)
+            self.serializer.observe(labels, metrics.serializer_seconds)
+            if size is not None:
+                self.size.observe(labels, size)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric in (self.requests, self.duplicates, self.duration, self.queries, self.sql,
+                           self.serializer, self.size):
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines += [f"{name}{_format_labels(labels)} {value}" for name, labels, value in metric.samples()]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,102 @@
+import re
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import include, path
+from rest_framework import serializers
+
+from .collector import fingerprint
+from .drf import TimedSerializerMixin
+
+
+class ItemSerializer(TimedSerializerMixin, serializers.Serializer):
+    name = serializers.CharField()
+
+
+def repeated_queries(request):
+    with connection.cursor() as cursor:
+        for i in range(4):
+            cursor.execute("SELECT %s", [i])
+    return HttpResponse("ok")
+
+
+def serialized(request):
+    data = ItemSerializer([{"name": str(i)} for i in range(500)], many=True).data
+    return HttpResponse(str(len(data)))
+
+
+async def async_view(request):
+    return HttpResponse("async")
+
+
+urlpatterns = [
+    path("repeated/", repeated_queries, name="metrics-test-repeated"),
+    path("serialized/", serialized, name="metrics-test-serialized"),
+    path("async/", async_view, name="metrics-test-async"),
+    path("metrics/", include("request_metrics.urls")),
+]
+
+
+def _timings(response):
+    return dict(re.findall(r"(\w+);(?:desc=\"[^\"]*\";)?dur=([\d.]+)", response["Server-Timing"]))
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=["request_metrics.middleware.RequestMetricsMiddleware"],
+    REQUEST_METRICS_TOKEN="secret",
+    REQUEST_METRICS_ALLOWED_IPS=["127.0.0.1"],
+    REQUEST_METRICS_DUPLICATE_THRESHOLD=10,
+)
+class RequestMetricsMiddlewareTests(TestCase):
+    def test_server_timing_counts_queries(self):
+        response = self.client.get("/repeated/")
+        self.assertIn('db;desc="4 queries"', response["Server-Timing"])
+        self.assertEqual(set(_timings(response)), {"db", "serializer", "total"})
+
+    def test_serializer_time_is_reported(self):
+        response = self.client.get("/serialized/")
+        self.assertEqual(response.content, b"500")
+        self.assertIn('db;desc="0 queries"', response["Server-Timing"])
+        self.assertGreater(float(_timings(response)["serializer"]), 0)
+
+    async def test_async_view_is_timed(self):
+        response = await AsyncClient().get("/async/")
+        self.assertEqual(response.content, b"async")
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    @override_settings(REQUEST_METRICS_DUPLICATE_THRESHOLD=3)
+    def test_duplicates_are_logged_and_exported(self):
+        with self.assertLogs("request_metrics", "WARNING") as logs:
+            self.client.get("/repeated/")
+        self.assertIn("metrics-test-repeated ran the same query 4 times", logs.output[0])
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn(
+            'django_requests_total{view="metrics-test-repeated",method="GET",status="200"}', body
+        )
+        self.assertRegex(
+            body, r'django_request_duplicate_queries_total\{view="metrics-test-repeated",method="GET"\} \d'
+        )
+        self.assertIn('django_request_queries_bucket{view="metrics-test-repeated",method="GET",le="5"}', body)
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        self.assertNotIn("Server-Timing", self.client.get("/repeated/"))
+
+    def test_metrics_endpoint_requires_allowed_ip_or_token(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 200)
+        self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1").status_code, 403)
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1", headers={"Authorization": "Bearer nope"})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1", headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_literals_and_in_lists_collapse(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  AND n = 3"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? AND n = ?",
+        )
+        self.assertEqual(fingerprint("SELECT 1"), fingerprint("SELECT 22"))
@@ -0,0 +1,100 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import path
+
+from .profiler import Profile
+
+
+def slow_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    time.sleep(0.05)
+    return HttpResponse("ok")
+
+
+async def async_view(request):
+    return HttpResponse("async")
+
+
+urlpatterns = [
+    path("slow/", slow_view, name="profiler-test-slow"),
+    path("async/", async_view, name="profiler-test-async"),
+]
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=[
+        "request_metrics.middleware.RequestMetricsMiddleware",
+        "request_metrics.profiler.SamplingProfilerMiddleware",
+    ],
+    REQUEST_PROFILER_TOKEN="secret",
+    REQUEST_PROFILER_RATE=0,
+    REQUEST_PROFILER_INTERVAL=0.002,
+    REQUEST_PROFILER_KEEP=2,
+)
+class SamplingProfilerMiddlewareTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+        override = override_settings(REQUEST_PROFILER_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def profile(self, **headers):
+        return self.client.get("/slow/", headers={"X-Profile": "secret", **headers})
+
+    def test_unprofiled_requests_write_nothing(self):
+        self.assertNotIn("X-Profile-Id", self.client.get("/slow/"))
+        self.assertNotIn("X-Profile-Id", self.profile(**{"X-Profile": "wrong"}))
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    @override_settings(REQUEST_PROFILER_TOKEN="")
+    def test_empty_token_disables_the_header(self):
+        self.assertNotIn("X-Profile-Id", self.client.get("/slow/", headers={"X-Profile": ""}))
+
+    def test_profile_records_stacks_and_sql_spans(self):
+        response = self.profile()
+        profile_id = response["X-Profile-Id"]
+        self.assertIn("profiler-test-slow", profile_id)
+        self.assertIn("slow_view", (self.directory / f"{profile_id}.collapsed").read_text())
+
+        data = json.loads((self.directory / f"{profile_id}.speedscope.json").read_text())
+        sampled, evented = data["profiles"]
+        self.assertTrue(sampled["samples"])
+        self.assertEqual(len(sampled["samples"]), len(sampled["weights"]))
+        frames = data["shared"]["frames"]
+        self.assertEqual([(event["type"], frames[event["frame"]]["name"]) for event in evented["events"]],
+                         [("O", "SQL: SELECT ?"), ("C", "SQL: SELECT ?")])
+        # the profiled request still reports to the metrics middleware
+        self.assertIn('db;desc="1 queries"', response["Server-Timing"])
+
+    def test_only_the_newest_profiles_are_kept(self):
+        ids = [self.profile()["X-Profile-Id"] for _ in range(3)]
+        kept = sorted(path.name for path in self.directory.iterdir())
+        self.assertEqual(kept, sorted(f"{profile_id}{suffix}" for profile_id in ids[1:]
+                                      for suffix in (".collapsed", ".speedscope.json")))
+
+    @override_settings(REQUEST_PROFILER_RATE=1)
+    def test_rate_profiles_without_header(self):
+        self.assertIn("X-Profile-Id", self.client.get("/slow/"))
+
+    async def test_async_request_is_profiled(self):
+        response = await AsyncClient().get("/async/", headers={"X-Profile": "secret"})
+        self.assertEqual(response.content, b"async")
+        self.assertTrue((self.directory / f"{response['X-Profile-Id']}.speedscope.json").exists())
+
+
+class ProfileTests(SimpleTestCase):
+    def test_collapsed_weights_samples_by_elapsed_time(self):
+        view = ("view", "views.py", 1)
+        query = ("SQL: SELECT ?", "", 0)
+        profile = Profile("GET /", 0.0, 0.005, [(0.001, (view,)), (0.004, (view, query)), (0.005, (view,))], [])
+        self.assertEqual(profile.collapsed(), "view;SQL: SELECT ? 3000\nview 2000\n")
@@ -0,0 +1,130 @@
+"""
+Query budgets: checked-in upper bounds on the queries an endpoint may run.
+
+Budgets live in a JSON file per project, keyed by endpoint name and data
+scale (``{"BookListView": {"1x": 2, "10x": 2}}``). A test measures an
+endpoint once at its normal fixture size and once with ten times the data.
+It fails when either count exceeds the recorded budget, or when the count
+grows with the data at all: that is an N+1 query.
+
+Run the tests with ``QUERY_BUDGET_UPDATE=1`` to write the observed counts
+into the baseline instead of checking them, then review the diff.
+
+unittest::
+
+    class BookTests(QueryBudgetMixin, APITestCase):
+        query_budget_file = Path(__file__).resolve().parent.parent / "query_budgets.json"
+
+        def test_list(self):
+            self.assertQueryBudgetScales("BookListView", lambda: self.client.get(url), self.add_books)
+
+pytest: add ``pytest_plugins = ["request_metrics.testing"]`` to a conftest,
+override the ``query_budget_file`` fixture, and use the ``query_budget``
+fixture's ``check()`` and ``check_scales()``.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+UPDATE_ENV = "QUERY_BUDGET_UPDATE"
+
+_write_lock = threading.Lock()
+
+
+def _format_queries(captured):
+    return "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(captured.captured_queries, 1))
+
+
+class QueryBudget:
+    def __init__(self, path, update=None):
+        self.path = Path(path)
+        self.update = os.environ.get(UPDATE_ENV, "") not in ("", "0") if update is None else update
+
+    def budgets(self):
+        if not self.path.exists():
+            return {}
+        with open(self.path) as fh:
+            return json.load(fh)
+
+    def record(self, name, scale, count):
+        with _write_lock:
+            budgets = self.budgets()
+            budgets.setdefault(name, {})[f"{scale}x"] = count
+            with open(self.path, "w") as fh:
+                json.dump(budgets, fh, indent=2, sort_keys=True)
+                fh.write("\n")
+
+    @contextmanager
+    def check(self, name, scale=1, using=DEFAULT_DB_ALIAS):
+        """Count the queries run in the block against ``name``'s budget at ``scale``."""
+        with CaptureQueriesContext(connections[using]) as captured:
+            yield captured
+        count = len(captured)
+        if self.update:
+            self.record(name, scale, count)
+            return
+        budget = self.budgets().get(name, {}).get(f"{scale}x")
+        if budget is None:
+            raise AssertionError(
+                f"No query budget recorded for {name} at {scale}x in {self.path}; "
+                f"run the tests with {UPDATE_ENV}=1 to record one"
+            )
+        if count > budget:
+            raise AssertionError(
+                f"{name} ran {count} queries at {scale}x data, over its budget of {budget}:\n"
+                f"{_format_queries(captured)}"
+            )
+
+    def check_scales(self, name, request, grow, factor=10, allow_growth=False, using=DEFAULT_DB_ALIAS):
+        """
+        Check ``request()`` at the current data size, call ``grow(factor)`` to
+        multiply the data, and check it again. Unless ``allow_growth``, the
+        larger dataset may not cost more queries than the smaller one.
+        """
+        with self.check(name, 1, using) as small:
+            request()
+        grow(factor)
+        with self.check(name, factor, using) as large:
+            request()
+        if not allow_growth and len(large) > len(small):
+            raise AssertionError(
+                f"{name} ran {len(small)} queries at 1x data but {len(large)} at {factor}x; "
+                f"the extra queries are likely an N+1:\n{_format_queries(large)}"
+            )
+
+
+class QueryBudgetMixin:
+    """unittest integration; set ``query_budget_file`` on the test case."""
+    query_budget_file = None
+
+    @property
+    def query_budget(self):
+        if self.query_budget_file is None:
+            raise AssertionError(f"{type(self).__name__} must set query_budget_file")
+        return QueryBudget(self.query_budget_file)
+
+    def assertQueryBudget(self, name, scale=1, using=DEFAULT_DB_ALIAS):
+        return self.query_budget.check(name, scale, using)
+
+    def assertQueryBudgetScales(self, name, request, grow, factor=10, allow_growth=False, using=DEFAULT_DB_ALIAS):
+        self.query_budget.check_scales(name, request, grow, factor, allow_growth, using)
+
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget_file(request):
+        return Path(request.config.rootpath) / "query_budgets.json"
+
+    @pytest.fixture
+    def query_budget(query_budget_file):
+        return QueryBudget(query_budget_file)
@@ -0,0 +1,21 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .registry import registry
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint. Open to REQUEST_METRICS_ALLOWED_IPS (default
+    loopback only), or to ``Authorization: Bearer <REQUEST_METRICS_TOKEN>``.
+    """
+    token = getattr(settings, "REQUEST_METRICS_TOKEN", "")
+    allowed_ips = getattr(settings, "REQUEST_METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+    authorized = request.META.get("REMOTE_ADDR") in allowed_ips or (
+        token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,211 @@
+"""
+In-memory adjacency index of the follow graph.
+
+Each user's followers and followees are kept as sorted ``array('q')`` id lists
+(8 bytes per edge and direction), so follow checks are a binary search and
+follower lists need no join. The index is built from the ``User.followers``
+table on first use and updated incrementally by the follow/unfollow views.
+
+Every change bumps a generation counter in the default cache. A process that
+sees a generation it did not produce (a change made by another worker)
+rebuilds its copy. It also rebuilds after SOCIAL_GRAPH_MAX_AGE seconds. The
+ASGI/WSGI entry points call ``warm()`` so the first request does not pay for
+the build.
+
+That counter only reaches other workers through a shared cache. Without one
+(SOCIAL_GRAPH_INDEX off) there is no whole-graph copy: each user's lists are
+read from the database when asked for and reused for
+SOCIAL_GRAPH_SYNC_INTERVAL seconds.
+
+Feed fan-out does not use this index (see ``posts.feed``).
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections
+
+GENERATION_KEY = "accounts:graph:generation"
+# lazily loaded lists kept before expired ones are pruned
+LAZY_MAX_ENTRIES = 10000
+_EMPTY = array("q")
+
+
+def _contains(ids, value):
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+def _remove(ids, value):
+    i = bisect_left(ids, value)
+    if i < len(ids) and ids[i] == value:
+        del ids[i]
+
+
+class SocialGraph:
+    def __init__(self):
+        self._followers = {}
+        self._following = {}
+        self._generation = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._loaded = {}
+        self._lock = threading.RLock()
+
+    # -- queries -----------------------------------------------------------
+
+    def followers_of(self, user_id):
+        if not settings.SOCIAL_GRAPH_INDEX:
+            return self._lazy("followers", user_id, lambda: _ids(from_user_id=user_id, field="to_user_id"))
+        return self._fresh()._followers.get(user_id, _EMPTY)
+
+    def following_of(self, user_id):
+        if not settings.SOCIAL_GRAPH_INDEX:
+            return self._lazy("following", user_id, lambda: _ids(to_user_id=user_id, field="from_user_id"))
+        return self._fresh()._following.get(user_id, _EMPTY)
+
+    def follower_count(self, user_id):
+        if not settings.SOCIAL_GRAPH_INDEX:
+            return self._lazy("follower_count", user_id, lambda: _follows().filter(from_user_id=user_id).count())
+        return len(self.followers_of(user_id))
+
+    def is_following(self, follower_id, followee_id):
+        return _contains(self.following_of(follower_id), followee_id)
+
+    def is_mutual(self, user_id, other_id):
+        return self.is_following(user_id, other_id) and self.is_following(other_id, user_id)
+
+    def mutuals_of(self, user_id):
+        """Users who both follow and are followed by ``user_id`` (sorted merge)."""
+        followers, following = self.followers_of(user_id), self.following_of(user_id)
+        mutual, i, j = [], 0, 0
+        while i < len(followers) and j < len(following):
+            if followers[i] == following[j]:
+                mutual.append(followers[i])
+                i += 1
+                j += 1
+            elif followers[i] < following[j]:
+                i += 1
+            else:
+                j += 1
+        return mutual
+
+    # -- maintenance -------------------------------------------------------
+
+    def add_edge(self, follower_id, followee_id):
+        if not settings.SOCIAL_GRAPH_INDEX:
+            self._forget(follower_id, followee_id)
+            return
+        with self._lock:
+            if self._generation is not None:
+                following = self._following.setdefault(follower_id, array("q"))
+                if not _contains(following, followee_id):
+                    insort(following, followee_id)
+                    insort(self._followers.setdefault(followee_id, array("q")), follower_id)
+            self._bump()
+
+    def remove_edge(self, follower_id, followee_id):
+        if not settings.SOCIAL_GRAPH_INDEX:
+            self._forget(follower_id, followee_id)
+            return
+        with self._lock:
+            if self._generation is not None:
+                _remove(self._following.get(follower_id, array("q")), followee_id)
+                _remove(self._followers.get(followee_id, array("q")), follower_id)
+            self._bump()
+
+    def rebuild(self):
+        generation = cache.get(GENERATION_KEY, 0)
+        followers, following = {}, {}
+        edges = (
+            _follows()
+            .order_by("from_user_id", "to_user_id")
+            .values_list("from_user_id", "to_user_id")
+        )
+        # from_user is followed by to_user; the ordering keeps both sides sorted
+        for followee_id, follower_id in edges.iterator(chunk_size=10000):
+            followers.setdefault(followee_id, array("q")).append(follower_id)
+            following.setdefault(follower_id, array("q")).append(followee_id)
+        with self._lock:
+            self._followers, self._following = followers, following
+            self._generation = generation
+            self._built_at = self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Force a rebuild on next read, e.g. after bulk-loading follows."""
+        with self._lock:
+            self._generation = None
+            self._loaded = {}
+
+    def warm(self):
+        """Build the index in a background thread, e.g. at process start."""
+        if settings.SOCIAL_GRAPH_INDEX:
+            threading.Thread(target=self._warm, name="social-graph-warm", daemon=True).start()
+
+    def _warm(self):
+        try:
+            self._fresh()
+        finally:
+            close_old_connections()
+
+    def _lazy(self, kind, user_id, load):
+        now = time.monotonic()
+        entry = self._loaded.get((kind, user_id))
+        if entry is None or now - entry[0] >= settings.SOCIAL_GRAPH_SYNC_INTERVAL:
+            entry = (now, load())
+            with self._lock:
+                if len(self._loaded) >= LAZY_MAX_ENTRIES:
+                    interval = settings.SOCIAL_GRAPH_SYNC_INTERVAL
+                    self._loaded = {key: value for key, value in self._loaded.items() if now - value[0] < interval}
+                self._loaded[(kind, user_id)] = entry
+        return entry[1]
+
+    def _forget(self, follower_id, followee_id):
+        with self._lock:
+            self._loaded.pop(("following", follower_id), None)
+            self._loaded.pop(("followers", followee_id), None)
+            self._loaded.pop(("follower_count", followee_id), None)
+
+    def _bump(self):
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 0, None)
+            generation = cache.incr(GENERATION_KEY)
+        # anything other than exactly our own change means another process
+        # touched the graph meanwhile: rebuild on next read
+        if self._generation is not None and generation == self._generation + 1:
+            self._generation = generation
+        else:
+            self._generation = None
+
+    def _fresh(self):
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at < settings.SOCIAL_GRAPH_SYNC_INTERVAL:
+            return self
+        with self._lock:
+            stale = (
+                self._generation is None
+                or now - self._built_at > settings.SOCIAL_GRAPH_MAX_AGE
+                or cache.get(GENERATION_KEY, 0) != self._generation
+            )
+            if stale:
+                self.rebuild()
+            self._checked_at = now
+        return self
+
+
+def _follows():
+    return get_user_model().followers.through.objects
+
+
+def _ids(field, **filters):
+    # from_user is followed by to_user
+    return array("q", _follows().filter(**filters).order_by(field).values_list(field, flat=True))
+
+
+graph = SocialGraph()
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from posts import feed
+from posts.models import Post
+
+User = get_user_model()
+Follow = User.followers.through
+
+
+def _count_subquery(field):
+    rows = Follow.objects.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("pk"))
+    return Coalesce(Subquery(rows.values("n")), 0)
+
+
+class Command(BaseCommand):
+    help = "Repair drift in the denormalized User.followers_count / User.following_count columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Number of user ids updated per statement")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        max_id = User.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+
+        drifted = User.objects.annotate(
+            actual_followers=_count_subquery("from_user"),
+            actual_following=_count_subquery("to_user"),
+        ).filter(~Q(followers_count=F("actual_followers")) | ~Q(following_count=F("actual_following")))
+
+        fixed = 0
+        for start in range(0, max_id, batch_size):
+            fixed += drifted.filter(id__gt=start, id__lte=start + batch_size).update(
+                followers_count=_count_subquery("from_user"),
+                following_count=_count_subquery("to_user"),
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled follow counts on {fixed} user(s)"))
+
+        # authors now under the fan-out threshold no longer need their posts merged on read
+        authors = (
+            Post.objects.filter(fanned_out=False, author__followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS)
+            .values_list("author_id", flat=True)
+            .distinct()
+        )
+        absorbed = sum(feed.absorb(author_id) for author_id in list(authors))
+        self.stdout.write(self.style.SUCCESS(f"Fanned out {absorbed} pulled post(s)"))
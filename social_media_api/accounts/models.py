@@ -8,6 +8,28 @@ class User(AbstractUser):
     followers = models.ManyToManyField(
         "self", symmetrical=False, related_name="following", blank=True
     )
+    # denormalized counts, maintained by the follow/unfollow views
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+    # set when this user's follows change; compute_recommendations --incremental picks it up
+    recommendations_stale = models.BooleanField(default=True, editable=False)
 
     def __str__(self):
         return self.username
+
+
+class Recommendation(models.Model):
+    """A precomputed "people you may know" suggestion (see compute_recommendations)."""
+    user = models.ForeignKey(User, related_name="recommendations", on_delete=models.CASCADE)
+    candidate = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    # number of accounts the user follows that follow the candidate
+    score = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "candidate")
+        ordering = ["-score"]
+        indexes = [models.Index(fields=["user", "-score"], name="recommendation_user_score_idx")]
+
+    def __str__(self):
+        return f"{self.candidate_id} for {self.user_id} ({self.score})"
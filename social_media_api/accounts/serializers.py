@@ -1,20 +1,52 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate, get_user_model
-from .models import User
+from request_metrics.drf import TimedSerializerMixin
+from django.conf import settings
+from django.contrib.auth import authenticate
+from .models import User, Recommendation
+from .graph import graph
 from rest_framework.authtoken.models import Token
 
-User = get_user_model().objects.create_user
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     followers_count = serializers.SerializerMethodField()
+    following_count = serializers.SerializerMethodField()
+    followed_by_me = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ("id", "username", "email", "bio", "profile_picture", "followers_count")
+        fields = ("id", "username", "email", "bio", "profile_picture", "followers_count", "following_count",
+                  "followed_by_me")
+        read_only_fields = ("followed_by_me",)
 
+    # Prefer counts annotated by the list views, then the stored counters.
     def get_followers_count(self, obj):
+        if hasattr(obj, "num_followers"):
+            return obj.num_followers
+        if settings.ACCOUNTS_FOLLOW_COUNTERS:
+            return obj.followers_count
         return obj.followers.count()
 
+    def get_following_count(self, obj):
+        if hasattr(obj, "num_following"):
+            return obj.num_following
+        if settings.ACCOUNTS_FOLLOW_COUNTERS:
+            return obj.following_count
+        return obj.following.count()
+
+    def get_followed_by_me(self, obj):
+        request = self.context.get("request")
+        if request and request.user.is_authenticated:
+            return graph.is_following(request.user.id, obj.id)
+        return False
+
+
+class RecommendationSerializer(serializers.ModelSerializer):
+    user = UserSerializer(source="candidate", read_only=True)
+
+    class Meta:
+        model = Recommendation
+        fields = ("user", "score")
+
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from .graph import GENERATION_KEY, SocialGraph, graph
+from .models import User
+
+
+class SocialGraphTestCase(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", password="testpass")
+        self.bob = User.objects.create_user(username="bob", password="testpass")
+
+    @override_settings(SOCIAL_GRAPH_INDEX=False, SOCIAL_GRAPH_SYNC_INTERVAL=0)
+    def test_without_index_reads_follows_made_elsewhere(self):
+        graph = SocialGraph()
+        self.assertFalse(graph.is_following(self.alice.id, self.bob.id))
+        # another worker records the follow; this process is never told
+        self.bob.followers.add(self.alice)
+        self.assertTrue(graph.is_following(self.alice.id, self.bob.id))
+        self.assertEqual(graph.follower_count(self.bob.id), 1)
+
+    @override_settings(SOCIAL_GRAPH_INDEX=False, SOCIAL_GRAPH_SYNC_INTERVAL=60)
+    def test_without_index_local_edges_drop_cached_lists(self):
+        graph = SocialGraph()
+        self.assertEqual(list(graph.followers_of(self.bob.id)), [])
+        self.bob.followers.add(self.alice)
+        graph.add_edge(self.alice.id, self.bob.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(graph.followers_of(self.bob.id)), [self.alice.id])
+        with self.assertNumQueries(0):
+            graph.followers_of(self.bob.id)
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True)
+    def test_build_reads_every_edge(self):
+        self.bob.followers.add(self.alice)
+        index = SocialGraph()
+        index.rebuild()
+        with self.assertNumQueries(0):
+            self.assertTrue(index.is_following(self.alice.id, self.bob.id))
+            self.assertEqual(index.follower_count(self.bob.id), 1)
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, SOCIAL_GRAPH_SYNC_INTERVAL=0)
+    def test_change_by_another_worker_triggers_rebuild(self):
+        mine, theirs = SocialGraph(), SocialGraph()
+        self.assertFalse(mine.is_following(self.alice.id, self.bob.id))
+        self.bob.followers.add(self.alice)
+        theirs.add_edge(self.alice.id, self.bob.id)
+        self.assertTrue(mine.is_following(self.alice.id, self.bob.id))
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, SOCIAL_GRAPH_SYNC_INTERVAL=0)
+    def test_own_change_is_applied_without_rebuild(self):
+        mine = SocialGraph()
+        mine.followers_of(self.bob.id)
+        self.bob.followers.add(self.alice)
+        mine.add_edge(self.alice.id, self.bob.id)
+        # the generation moved by exactly our own bump: no rebuild
+        with self.assertNumQueries(0):
+            self.assertEqual(list(mine.followers_of(self.bob.id)), [self.alice.id])
+        mine.remove_edge(self.alice.id, self.bob.id)
+        self.assertEqual(list(mine.followers_of(self.bob.id)), [])
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, SOCIAL_GRAPH_SYNC_INTERVAL=0)
+    def test_lost_generation_triggers_rebuild(self):
+        mine = SocialGraph()
+        mine.followers_of(self.bob.id)
+        self.bob.followers.add(self.alice)
+        cache.set(GENERATION_KEY, 41)  # evicted and restarted by another worker
+        self.assertEqual(list(mine.followers_of(self.bob.id)), [self.alice.id])
+
+    @override_settings(SOCIAL_GRAPH_INDEX=True, SOCIAL_GRAPH_SYNC_INTERVAL=60)
+    def test_invalidate_forces_rebuild(self):
+        mine = SocialGraph()
+        mine.followers_of(self.bob.id)
+        self.bob.followers.add(self.alice)  # bulk load behind the graph's back
+        self.assertEqual(list(mine.followers_of(self.bob.id)), [])
+        mine.invalidate()
+        self.assertEqual(list(mine.followers_of(self.bob.id)), [self.alice.id])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_ASYNC=False, SOCIAL_GRAPH_INDEX=True)
+class FollowEndpointsGraphTestCase(APITestCase):
+    def test_follow_and_unfollow_update_followed_by_me(self):
+        alice = User.objects.create_user(username="alice", password="testpass")
+        bob = User.objects.create_user(username="bob", password="testpass")
+        graph.invalidate()
+        self.client.force_authenticate(alice)
+        url = reverse("public-profile", args=[bob.username])
+        self.assertFalse(self.client.get(url).data["followed_by_me"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("follow-user", args=[bob.id]))
+        self.assertTrue(self.client.get(url).data["followed_by_me"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("unfollow-user", args=[bob.id]))
+        self.assertFalse(self.client.get(url).data["followed_by_me"])
@@ -0,0 +1,69 @@
+import importlib.util
+import unittest
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from .models import Recommendation, User
+
+HAS_SCIPY = importlib.util.find_spec("numpy") and importlib.util.find_spec("scipy")
+
+
+def follow(follower, *followees):
+    for followee in followees:
+        followee.followers.add(follower)
+
+
+@unittest.skipUnless(HAS_SCIPY, "compute_recommendations needs numpy and scipy")
+class ComputeRecommendationsTestCase(TestCase):
+    def setUp(self):
+        self.a, self.b, self.c, self.d, self.e, self.x = [
+            User.objects.create_user(username=name, password="testpass") for name in "abcdex"
+        ]
+        follow(self.a, self.b, self.c)
+        follow(self.b, self.d)
+        follow(self.c, self.d, self.e)
+
+    def compute(self, **options):
+        call_command("compute_recommendations", stdout=StringIO(), **options)
+
+    def scores(self, user):
+        return dict(Recommendation.objects.filter(user=user).values_list("candidate__username", "score"))
+
+    def test_full_run_counts_two_hop_paths(self):
+        self.compute()
+        self.assertEqual(self.scores(self.a), {"d": 2, "e": 1})
+        self.assertEqual(self.scores(self.b), {})
+        self.assertEqual(self.scores(self.c), {})
+
+    def test_limit_keeps_the_best_candidates(self):
+        self.compute(limit=1)
+        self.assertEqual(self.scores(self.a), {"d": 2})
+
+    def test_incremental_refreshes_changed_users_and_their_followers(self):
+        self.compute()
+        User.objects.update(recommendations_stale=False)
+        # a recommendation the incremental run must leave alone
+        Recommendation.objects.create(user=self.x, candidate=self.a, score=7)
+        follow(self.b, self.e)
+        User.objects.filter(pk=self.b.pk).update(recommendations_stale=True)
+        self.compute(incremental=True)
+        self.assertEqual(self.scores(self.a), {"d": 2, "e": 2})
+        self.assertEqual(self.scores(self.x), {"a": 7})
+        self.assertFalse(User.objects.filter(recommendations_stale=True).exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_ASYNC=False)
+class RecommendationsEndpointTestCase(APITestCase):
+    def test_follow_flags_user_and_hides_followed_candidates(self):
+        alice, bob, carol = [User.objects.create_user(username=name, password="testpass")
+                             for name in ("alice", "bob", "carol")]
+        Recommendation.objects.create(user=alice, candidate=bob, score=2)
+        Recommendation.objects.create(user=alice, candidate=carol, score=1)
+        self.client.force_authenticate(alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("follow-user", args=[bob.id]))
+        self.assertTrue(User.objects.get(pk=alice.pk).recommendations_stale)
+        response = self.client.get(reverse("recommendations"))
+        self.assertEqual([item["user"]["username"] for item in response.data], ["carol"])
@@ -1,10 +1,11 @@
 from django.urls import path
-from .views import RegisterAPIView, LoginAPIView, ProfileAPIView, PublicProfileAPIView, FollowUserAPIView, UnfollowUserAPIView, FollowersListAPIView, FollowingListAPIView
+from .views import RegisterAPIView, LoginAPIView, ProfileAPIView, PublicProfileAPIView, FollowUserAPIView, UnfollowUserAPIView, FollowersListAPIView, FollowingListAPIView, RecommendationsAPIView
 
 urlpatterns = [
     path("register/", RegisterAPIView.as_view(), name="register"),
     path("login/", LoginAPIView.as_view(), name="login"),
     path("profile/", ProfileAPIView.as_view(), name="profile"),
+    path("recommendations/", RecommendationsAPIView.as_view(), name="recommendations"),
     path("users/<str:username>/", PublicProfileAPIView.as_view(), name="public-profile"),
     path("follow/<int:user_id>/", FollowUserAPIView.as_view(), name="follow-user"),
     path("unfollow/<int:user_id>/", UnfollowUserAPIView.as_view(), name="unfollow-user"),
@@ -4,11 +4,32 @@ from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
-from .models import Post, Notification
-from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .serializers import RegisterSerializer, LoginSerializer, UserSerializer, RecommendationSerializer
+from .models import Recommendation
+from .graph import graph
+from notifications.dispatch import notify
+from posts import feed
+from social_media_api.conditional import conditional, make_etag
 
 CustomUser = get_user_model()
+# row (from_user=B, to_user=A) means A follows B
+Follow = CustomUser.followers.through
+
+
+def with_follow_counts(queryset):
+    """Annotate follower/following counts in the same query (counters disabled)."""
+    if settings.ACCOUNTS_FOLLOW_COUNTERS:
+        return queryset
+
+    def count(field):
+        rows = Follow.objects.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("pk"))
+        return Coalesce(Subquery(rows.values("n")), 0)
+
+    return queryset.annotate(num_followers=count("from_user"), num_following=count("to_user"))
 
 
 # Registration View using GenericAPIView
@@ -72,28 +93,40 @@ class PublicProfileAPIView(APIView):
 
     def get(self, request, username):
         user = get_object_or_404(CustomUser, username=username)
-        serializer = UserSerializer(user, context={"request": request})
-        return Response(serializer.data)
+        etag = make_etag(
+            request, "profile", user.pk, user.username, user.email, user.bio, user.profile_picture.name,
+            graph.follower_count(user.pk), len(graph.following_of(user.pk)),
+            graph.is_following(request.user.pk, user.pk),
+        )
+        return conditional(request, lambda: Response(UserSerializer(user, context={"request": request}).data), etag)
 
 
 # Follow / Unfollow
 class FollowUserAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
-    Notification.objects.create(
-    recipient=target,
-    actor=request.user,
-    verb="started following you",
-    # target can be None or point to actor
-    target_content_type=ContentType.objects.get_for_model(request.user),
-    target_object_id=str(request.user.id),
-)
 
     def post(self, request, user_id):
         if request.user.id == user_id:
             return Response({"detail": "You cannot follow yourself."},
                             status=status.HTTP_400_BAD_REQUEST)
         target = get_object_or_404(CustomUser, id=user_id)
-        request.user.following.add(target)
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(from_user=target, to_user=request.user)
+            if created:
+                CustomUser.objects.filter(pk=target.pk).update(followers_count=F("followers_count") + 1)
+                CustomUser.objects.filter(pk=request.user.pk).update(
+                    following_count=F("following_count") + 1, recommendations_stale=True
+                )
+                transaction.on_commit(lambda: graph.add_edge(request.user.id, target.id))
+        if created:
+            feed.backfill(request.user, target)
+            notify(
+                recipient_id=target.id,
+                actor_id=request.user.id,
+                verb="started following you",
+                # target can be None or point to actor
+                target=request.user,
+            )
         return Response({"detail": f"You are now following {target.username}."},
                         status=status.HTTP_200_OK)
 
@@ -106,7 +139,19 @@ class UnfollowUserAPIView(APIView):
             return Response({"detail": "You cannot unfollow yourself."},
                             status=status.HTTP_400_BAD_REQUEST)
         target = get_object_or_404(CustomUser, id=user_id)
-        request.user.following.remove(target)
+        with transaction.atomic():
+            removed, _ = Follow.objects.filter(from_user=target, to_user=request.user).delete()
+            if removed:
+                CustomUser.objects.filter(pk=target.pk, followers_count__gt=0).update(
+                    followers_count=F("followers_count") - 1
+                )
+                CustomUser.objects.filter(pk=request.user.pk, following_count__gt=0).update(
+                    following_count=F("following_count") - 1, recommendations_stale=True
+                )
+                transaction.on_commit(lambda: graph.remove_edge(request.user.id, target.id))
+        feed.trim(request.user, target)
+        if removed:
+            feed.absorb(target.id)
         return Response({"detail": f"You unfollowed {target.username}."},
                         status=status.HTTP_200_OK)
 
@@ -119,7 +164,7 @@ class FollowersListAPIView(generics.ListAPIView):
     def get_queryset(self):
         user_id = self.kwargs.get("user_id")
         user = get_object_or_404(CustomUser, id=user_id)
-        return user.followers.all()
+        return with_follow_counts(user.followers.all())
 
 
 class FollowingListAPIView(generics.ListAPIView):
@@ -129,4 +174,22 @@ class FollowingListAPIView(generics.ListAPIView):
     def get_queryset(self):
         user_id = self.kwargs.get("user_id")
         user = get_object_or_404(CustomUser, id=user_id)
-        return user.following.all()
+        return with_follow_counts(user.following.all())
+
+
+# "People you may know"
+class RecommendationsAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        recommendations = (
+            Recommendation.objects.filter(user=request.user)
+            .select_related("candidate")
+            .order_by("-score")[: settings.RECOMMENDATIONS_PER_USER]
+        )
+        # skip accounts followed since the last recompute
+        recommendations = [
+            rec for rec in recommendations if not graph.is_following(request.user.id, rec.candidate_id)
+        ]
+        serializer = RecommendationSerializer(recommendations, many=True, context={"request": request})
+        return Response(serializer.data)
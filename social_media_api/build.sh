@@ -9,5 +9,8 @@ pip install -r requirements.txt
 # Collect static files
 python manage.py collectstatic --noinput
 
+# Fail the build when a model change has no migration
+python manage.py makemigrations --check --dry-run
+
 # Apply migrations
 python manage.py migrate
@@ -0,0 +1,106 @@
+"""
+Coalescing of notification events.
+
+Events that share recipient, verb and target within NOTIFICATIONS_COALESCE_WINDOW
+seconds are folded into one unread row ("alice and 41 others liked your post")
+that is updated in place, instead of one row per event. Within a process each
+recipient's events go to one worker (see ``dispatch``); across processes the
+recipients' user rows are locked for the batch, so two writers never both
+open a row for the same key.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationActor
+from . import unread
+
+
+def _key(item):
+    if isinstance(item, Notification):
+        return (item.recipient_id, item.verb, item.target_content_type_id, item.target_object_id)
+    return (item["recipient_id"], item["verb"], item["target_content_type_id"], item["target_object_id"])
+
+
+def coalesce(events):
+    """Write a batch of events, merging them into recent unread notifications."""
+    groups = {}
+    for event in events:
+        actors = groups.setdefault(_key(event), [])
+        if event["actor_id"] not in actors:
+            actors.append(event["actor_id"])
+
+    all_actor_ids = {actor_id for actors in groups.values() for actor_id in actors}
+    usernames = dict(get_user_model().objects.filter(id__in=all_actor_ids).values_list("id", "username"))
+
+    lookup = Q()
+    for recipient_id, verb, content_type_id, object_id in groups:
+        lookup |= Q(
+            recipient_id=recipient_id,
+            verb=verb,
+            target_content_type_id=content_type_id,
+            target_object_id=object_id,
+        )
+
+    now = timezone.now()
+    window_start = now - timedelta(seconds=settings.NOTIFICATIONS_COALESCE_WINDOW)
+    sample_size = settings.NOTIFICATIONS_SAMPLE_ACTORS
+    to_create, to_update = [], []
+
+    with transaction.atomic():
+        # in id order, so two batches sharing recipients cannot deadlock
+        list(get_user_model().objects.select_for_update().filter(
+            id__in={key[0] for key in groups}
+        ).order_by("id").values_list("id", flat=True))
+        # oldest first, so the newest open row per key wins
+        open_rows = Notification.objects.select_for_update().filter(
+            lookup, unread=True, timestamp__gte=window_start
+        ).order_by("timestamp")
+        existing = {_key(row): row for row in open_rows}
+
+        for key, actor_ids in groups.items():
+            recipient_id, verb, content_type_id, object_id = key
+            newest_first = [usernames[actor_id] for actor_id in reversed(actor_ids) if actor_id in usernames]
+            row = existing.get(key)
+            if row is None:
+                to_create.append(Notification(
+                    recipient_id=recipient_id,
+                    actor_id=actor_ids[-1],
+                    verb=verb,
+                    target_content_type_id=content_type_id,
+                    target_object_id=object_id,
+                    actor_count=len(actor_ids),
+                    sample_actors=newest_first[:sample_size],
+                ))
+                continue
+            row.actor_id = actor_ids[-1]
+            row.sample_actors = (
+                newest_first + [name for name in row.sample_actors if name not in newest_first]
+            )[:sample_size]
+            row.timestamp = now
+            to_update.append(row)
+
+        Notification.objects.bulk_create(to_create)
+        # an actor repeating across batches must not be counted twice: record
+        # distinct (notification, actor) pairs and recount the merged rows
+        NotificationActor.objects.bulk_create(
+            [NotificationActor(notification=row, actor_id=actor_id)
+             for row in to_create + to_update for actor_id in groups[_key(row)]],
+            ignore_conflicts=True,
+        )
+        counts = dict(
+            NotificationActor.objects.filter(notification__in=to_update)
+            .order_by().values("notification").annotate(n=Count("id")).values_list("notification", "n")
+        )
+        for row in to_update:
+            row.actor_count = counts.get(row.pk, row.actor_count)
+        Notification.objects.bulk_update(to_update, ["actor", "actor_count", "sample_actors", "timestamp"])
+
+    # merged rows were already unread, so only new rows move the counters
+    for notification in to_create:
+        unread.adjust(notification.recipient_id, 1)
+    return to_create, to_update
@@ -0,0 +1,138 @@
+"""
+Background delivery of notifications.
+
+Views and signal handlers call ``notify()``, which only enqueues an event once
+the surrounding transaction commits. A small pool of worker threads drains the
+queue and writes notifications in batches, coalescing events that share a
+recipient, verb and target (see ``aggregation``), then publishes the rows to
+any connected SSE streams. Each worker owns a partition of the recipients, so
+two workers never coalesce events for the same recipient at once. Failed
+batches are put back on the queue, so delivery is at-least-once. Pending
+events are flushed when the process exits.
+
+``LocalBroker`` is an in-process stand-in for a real message broker; anything
+exposing ``partitions`` and ``publish``/``consume``/``requeue``/``pending`` can
+replace it.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+
+from .aggregation import coalesce
+from .pubsub import pubsub
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroker:
+    """Unbounded in-memory FIFOs, one per worker thread, partitioned by recipient."""
+
+    def __init__(self, partitions=1):
+        self.partitions = partitions
+        self._queues = [queue.Queue() for _ in range(partitions)]
+
+    def _queue(self, event):
+        return self._queues[event["recipient_id"] % self.partitions]
+
+    def publish(self, event):
+        self._queue(event).put(event)
+
+    def consume(self, partition, max_items, timeout):
+        """Block up to ``timeout`` seconds for one event, then take up to ``max_items``."""
+        events_queue = self._queues[partition]
+        try:
+            events = [events_queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(events) < max_items:
+            try:
+                events.append(events_queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def requeue(self, events):
+        for event in events:
+            self._queue(event).put(event)
+
+    def pending(self):
+        return sum(events_queue.qsize() for events_queue in self._queues)
+
+
+class NotificationDispatcher:
+    def __init__(self, broker=None):
+        self.broker = broker or LocalBroker(settings.NOTIFICATIONS_WORKERS)
+        self._workers = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def notify(self, recipient_id, actor_id, verb, target=None):
+        event = {
+            "recipient_id": recipient_id,
+            "actor_id": actor_id,
+            "verb": verb,
+            "target_content_type_id": ContentType.objects.get_for_model(target).id if target is not None else None,
+            "target_object_id": str(target.pk) if target is not None else None,
+        }
+        if not settings.NOTIFICATIONS_ASYNC:
+            self.flush([event])
+            return
+        self._ensure_started()
+        transaction.on_commit(lambda: self.broker.publish(event))
+
+    def flush(self, events):
+        created, updated = coalesce(events)
+        for notification in created + updated:
+            if notification.pk and pubsub.is_listening(notification.recipient_id):
+                pubsub.publish(notification.recipient_id, NotificationSerializer(notification).data)
+
+    def drain(self, timeout=10):
+        """Stop the workers after the queue is empty (or ``timeout`` expires)."""
+        deadline = time.monotonic() + timeout
+        while self.broker.pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopping.set()
+        for worker in self._workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+        self._workers = []
+        self._stopping.clear()
+
+    def _ensure_started(self):
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.broker.partitions):
+                worker = threading.Thread(target=self._run, args=(i,), name=f"notifications-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _run(self, partition):
+        while not self._stopping.is_set() or self.broker.pending():
+            events = self.broker.consume(
+                partition, settings.NOTIFICATIONS_BATCH_SIZE, settings.NOTIFICATIONS_FLUSH_INTERVAL
+            )
+            if not events:
+                continue
+            try:
+                self.flush(events)
+            except Exception:
+                logger.exception("Failed to write %d notification(s), requeueing", len(events))
+                self.broker.requeue(events)
+                time.sleep(settings.NOTIFICATIONS_FLUSH_INTERVAL)
+            finally:
+                close_old_connections()
+
+
+dispatcher = NotificationDispatcher()
+notify = dispatcher.notify
+
+atexit.register(dispatcher.drain)
@@ -17,8 +17,30 @@ class Notification(models.Model):
     unread = models.BooleanField(default=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    # Coalesced events: how many actors did this, and the most recent few usernames
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actors = models.JSONField(default=list, blank=True)
+
     class Meta:
-        ordering = ["-timestamp"]
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["recipient", "-id"], name="notif_recipient_id_idx"),
+            models.Index(fields=["recipient", "-timestamp", "-id"], name="notif_recipient_ts_idx"),
+            models.Index(
+                fields=["recipient", "target_content_type", "target_object_id", "verb"],
+                name="notif_coalesce_idx",
+            ),
+            models.Index(fields=["recipient"], condition=models.Q(unread=True), name="notif_recipient_unread_idx"),
+        ]
 
     def __str__(self):
         return f"Notification to {self.recipient} - {self.actor} {self.verb}"
+
+
+class NotificationActor(models.Model):
+    """One distinct actor folded into a coalesced notification; actor_count counts these."""
+    notification = models.ForeignKey(Notification, related_name="actors", on_delete=models.CASCADE)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("notification", "actor")
@@ -0,0 +1,10 @@
+from rest_framework.pagination import CursorPagination
+
+
+class NotificationCursorPagination(CursorPagination):
+    """
+    Keyset pagination on id without a COUNT(*) query. Not on timestamp:
+    coalescing moves a row's timestamp, which would skip or repeat it
+    between pages.
+    """
+    ordering = ("-id",)
@@ -0,0 +1,55 @@
+"""
+Pub/sub used to push notifications to connected SSE clients.
+
+``InProcessPubSub`` only reaches subscribers in the current process. For
+multi-node setups point NOTIFICATIONS_PUBSUB_BACKEND at another class with
+the same four methods; the stream view also re-checks the database on every
+heartbeat, so clients never miss rows written by another process.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class InProcessPubSub:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register the running event loop; returns the queue to await on."""
+        queue = asyncio.Queue(maxsize=settings.NOTIFICATIONS_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            self._subscribers[user_id] = {sub for sub in self._subscribers[user_id] if sub[1] is not queue}
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def is_listening(self, user_id):
+        return user_id in self._subscribers
+
+    def publish(self, user_id, message):
+        """Safe to call from any thread, e.g. the notification workers."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+
+def _offer(queue, message):
+    # a slow client drops live events; it catches up from the database on
+    # its next heartbeat
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+pubsub = import_string(settings.NOTIFICATIONS_PUBSUB_BACKEND)()
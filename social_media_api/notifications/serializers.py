@@ -1,15 +1,27 @@
 from rest_framework import serializers
+from request_metrics.drf import TimedSerializerMixin
 from .models import Notification
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     actor = serializers.SlugRelatedField(read_only=True, slug_field="username")
     recipient = serializers.SlugRelatedField(read_only=True, slug_field="username")
     target_repr = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Notification
-        fields = ("id", "recipient", "actor", "verb", "target_repr", "unread", "timestamp")
-        read_only_fields = ("id", "recipient", "actor", "verb", "target_repr", "timestamp")
+        fields = ("id", "recipient", "actor", "verb", "target_repr", "actor_count", "sample_actors",
+                  "summary", "unread", "timestamp")
+        read_only_fields = ("id", "recipient", "actor", "verb", "target_repr", "actor_count", "sample_actors",
+                            "summary", "timestamp")
+
+    def get_summary(self, obj):
+        # e.g. "alice liked your post" / "alice and 41 others liked your post"
+        actor = obj.sample_actors[0] if obj.sample_actors else obj.actor.username
+        others = obj.actor_count - 1
+        if others <= 0:
+            return f"{actor} {obj.verb}"
+        return f"{actor} and {others} other{'s' if others > 1 else ''} {obj.verb}"
 
     def get_target_repr(self, obj):
         # Human-readable target info
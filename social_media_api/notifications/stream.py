@@ -0,0 +1,105 @@
+"""
+Server-sent events endpoint for real-time notifications.
+
+Must be served through ASGI (social_media_api.asgi) so each open stream is a
+coroutine rather than a blocked worker. Clients resume with the standard
+``Last-Event-ID`` header (or ``?last_id=``) and EventSource clients, which
+cannot set headers, may authenticate with ``?token=``.
+
+Event ids are ``<timestamp>/<id>`` rather than the notification id: merging
+an event into an existing notification moves its timestamp but not its id,
+and a client resuming after that must still be sent the updated row.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework.authtoken.models import Token
+
+from .models import Notification
+from .pubsub import pubsub
+from .serializers import NotificationSerializer
+
+
+async def _authenticate(request):
+    header = request.headers.get("Authorization", "")
+    key = header.split(" ", 1)[1] if header.startswith("Token ") else request.GET.get("token")
+    if key:
+        try:
+            token = await Token.objects.select_related("user").aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        return token.user if token.user.is_active else None
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _cursor(payload):
+    return parse_datetime(payload["timestamp"]), payload["id"]
+
+
+def _parse_cursor(value):
+    timestamp, _, notification_id = value.rpartition("/")
+    timestamp = parse_datetime(timestamp)
+    if timestamp is None:
+        raise ValueError(value)
+    return timestamp, int(notification_id)
+
+
+@sync_to_async
+def _missed(user_id, cursor):
+    timestamp, last_id = cursor
+    notifications = Notification.objects.filter(
+        Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=last_id), recipient_id=user_id
+    ).order_by("timestamp", "id")
+    return NotificationSerializer(notifications[: settings.NOTIFICATIONS_STREAM_BACKLOG], many=True).data
+
+
+def _event(payload):
+    event_id = f"{payload['timestamp']}/{payload['id']}"
+    return f"id: {event_id}\nevent: notification\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def _events(user_id, cursor):
+    queue = pubsub.subscribe(user_id)
+    try:
+        yield f"retry: {settings.NOTIFICATIONS_STREAM_RETRY_MS}\n\n"
+        while True:
+            for payload in await _missed(user_id, cursor):
+                cursor = max(cursor, _cursor(payload))
+                yield _event(payload)
+            try:
+                while True:
+                    payload = await asyncio.wait_for(queue.get(), settings.NOTIFICATIONS_STREAM_HEARTBEAT)
+                    if _cursor(payload) <= cursor:
+                        # already sent from the database
+                        continue
+                    cursor = _cursor(payload)
+                    yield _event(payload)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+    finally:
+        pubsub.unsubscribe(user_id, queue)
+
+
+async def notification_stream(request):
+    user = await _authenticate(request)
+    if user is None:
+        return HttpResponse(status=401)
+    try:
+        cursor = _parse_cursor(request.headers.get("Last-Event-ID") or request.GET["last_id"])
+    except (KeyError, ValueError):
+        # fresh connection: only stream what happens from now on
+        cursor = await (
+            Notification.objects.filter(recipient_id=user.id)
+            .order_by("-timestamp", "-id").values_list("timestamp", "id").afirst()
+        ) or (datetime.min.replace(tzinfo=timezone.utc), 0)
+    response = StreamingHttpResponse(_events(user.id, cursor), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from posts.models import Post
+from .aggregation import coalesce
+from .dispatch import LocalBroker
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False)
+class CoalesceTestCase(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", password="testpass")
+        self.actors = [User.objects.create_user(username=f"actor{i}", password="testpass") for i in range(4)]
+        self.post = Post.objects.create(author=self.author, title="Post", content="content")
+
+    def event(self, actor, recipient=None):
+        return {
+            "recipient_id": (recipient or self.author).id,
+            "actor_id": actor.id,
+            "verb": "liked your post",
+            "target_content_type_id": ContentType.objects.get_for_model(Post).id,
+            "target_object_id": str(self.post.pk),
+        }
+
+    def test_racing_workers_route_a_recipient_to_one_partition(self):
+        broker = LocalBroker(partitions=2)
+        other = next(actor for actor in self.actors if actor.id % 2 != self.author.id % 2)
+        for actor in self.actors:
+            broker.publish(self.event(actor))
+            broker.publish(self.event(actor, recipient=other))
+        batches = [broker.consume(partition, 100, 0) for partition in range(2)]
+        for batch in batches:
+            self.assertEqual(len({event["recipient_id"] for event in batch}), 1)
+        for batch in batches:
+            coalesce(batch)
+        for recipient in (self.author, other):
+            notification = Notification.objects.get(recipient=recipient)
+            self.assertEqual(notification.actor_count, len(self.actors))
+
+    def test_batches_for_one_key_merge_into_one_row(self):
+        coalesce([self.event(actor) for actor in self.actors[:2]])
+        coalesce([self.event(actor) for actor in self.actors[1:]])
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.actor_count, len(self.actors))
+        self.assertEqual(notification.actor_id, self.actors[-1].id)
+
+    @override_settings(NOTIFICATIONS_SAMPLE_ACTORS=3)
+    def test_summary_names_newest_actors(self):
+        for actor in self.actors:
+            coalesce([self.event(actor)])
+        notification = Notification.objects.get(recipient=self.author)
+        self.assertEqual(notification.sample_actors, ["actor3", "actor2", "actor1"])
+        serializer = NotificationSerializer(notification)
+        self.assertEqual(serializer.data["summary"], "actor3 and 3 others liked your post")
+
+    def test_repeated_actor_counts_once(self):
+        coalesce([self.event(self.actors[0]), self.event(self.actors[0])])
+        coalesce([self.event(self.actors[0])])
+        self.assertEqual(Notification.objects.get(recipient=self.author).actor_count, 1)
+
+    @override_settings(NOTIFICATIONS_COALESCE_WINDOW=60)
+    def test_events_after_the_window_open_a_new_row(self):
+        coalesce([self.event(self.actors[0])])
+        Notification.objects.update(timestamp=timezone.now() - timedelta(seconds=61))
+        coalesce([self.event(self.actors[1])])
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+
+    def test_read_rows_are_not_merged_into(self):
+        coalesce([self.event(self.actors[0])])
+        Notification.objects.update(unread=False)
+        coalesce([self.event(self.actors[1])])
+        self.assertEqual(
+            list(Notification.objects.filter(recipient=self.author).order_by("id").values_list("unread", flat=True)),
+            [False, True],
+        )
@@ -0,0 +1,88 @@
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from accounts.models import User
+from .aggregation import coalesce
+from .dispatch import dispatcher
+from .models import Notification
+
+
+def _event(recipient, actor, target_id):
+    return {
+        "recipient_id": recipient.id,
+        "actor_id": actor.id,
+        "verb": "liked your post",
+        "target_content_type_id": None,
+        "target_object_id": str(target_id),
+    }
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, SECURE_SSL_REDIRECT=False, NOTIFICATIONS_STREAM_HEARTBEAT=0.05)
+class NotificationStreamTestCase(TestCase):
+    async def read_events(self, token, last_event_id=None):
+        headers = {"Authorization": f"Token {token.key}"}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        response = await AsyncClient().get(reverse("notifications-stream"), headers=headers)
+        chunks = response.streaming_content
+        events = []
+        try:
+            async for chunk in chunks:
+                chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+                if chunk.startswith(": heartbeat"):
+                    return events
+                if chunk.startswith("id: "):
+                    events.append(chunk.split("\n", 1)[0][len("id: "):])
+        finally:
+            await chunks.aclose()
+
+    async def test_resume_sends_notifications_updated_in_place(self):
+        user = await sync_to_async(User.objects.create_user)(username="reader", password="testpass")
+        actors = [await sync_to_async(User.objects.create_user)(username=f"actor{i}") for i in range(2)]
+        token = await Token.objects.acreate(user=user)
+        await sync_to_async(coalesce)([_event(user, actors[0], 1)])
+        first = await Notification.objects.aget(recipient=user)
+
+        [last_event_id] = await self.read_events(token, "1970-01-01T00:00:00Z/0")
+        self.assertTrue(last_event_id.endswith(f"/{first.id}"))
+
+        # while the client is away another actor is merged into the notification
+        await sync_to_async(coalesce)([_event(user, actors[1], 1)])
+        resumed = await self.read_events(token, last_event_id)
+        self.assertEqual(len(resumed), 1)
+        self.assertTrue(resumed[0].endswith(f"/{first.id}"))
+        self.assertNotEqual(resumed[0], last_event_id)
+
+        self.assertEqual(await self.read_events(token, resumed[0]), [])
+
+    async def test_invalid_last_event_id_starts_fresh(self):
+        user = await sync_to_async(User.objects.create_user)(username="reader", password="testpass")
+        actor = await sync_to_async(User.objects.create_user)(username="actor")
+        token = await Token.objects.acreate(user=user)
+        await sync_to_async(coalesce)([_event(user, actor, 1)])
+        self.assertEqual(await self.read_events(token, "not-a-cursor"), [])
+
+    async def test_live_notification_is_sent_once(self):
+        user = await sync_to_async(User.objects.create_user)(username="reader", password="testpass")
+        actor = await sync_to_async(User.objects.create_user)(username="actor")
+        token = await Token.objects.acreate(user=user)
+        response = await AsyncClient().get(reverse("notifications-stream"), {"token": token.key})
+        chunks = response.streaming_content
+        try:
+            self.assertTrue((await anext(chunks)).startswith(b"retry: "))
+            await sync_to_async(dispatcher.notify)(user.id, actor.id, "poked you")
+            notification = await Notification.objects.aget(recipient=user)
+            chunk = await anext(chunks)
+            self.assertIn(f"/{notification.id}\n".encode(), chunk)
+            self.assertIn(b"actor poked you", chunk)
+            # the database re-check after each heartbeat must not send it again
+            self.assertEqual([await anext(chunks) for _ in range(2)], [b": heartbeat\n\n"] * 2)
+        finally:
+            await chunks.aclose()
+
+    async def test_requires_authentication(self):
+        response = await AsyncClient().get(reverse("notifications-stream"))
+        self.assertEqual(response.status_code, 401)
+        response = await AsyncClient().get(reverse("notifications-stream"), {"token": "nope"})
+        self.assertEqual(response.status_code, 401)
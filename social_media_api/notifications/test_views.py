@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from accounts.models import User
+from .aggregation import coalesce
+from .models import Notification
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, SECURE_SSL_REDIRECT=False)
+class NotificationViewsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="testpass")
+        self.actor = User.objects.create_user(username="actor", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def event(self, target_id, actor=None):
+        return {
+            "recipient_id": self.user.id,
+            "actor_id": (actor or self.actor).id,
+            "verb": "liked your post",
+            "target_content_type_id": None,
+            "target_object_id": str(target_id),
+        }
+
+    def test_merge_between_pages_neither_skips_nor_repeats(self):
+        for target_id in range(12):
+            coalesce([self.event(target_id)])
+        first = self.client.get(reverse("notifications-list"))
+        self.assertEqual(len(first.data["results"]), 10)
+        # an event merged into the oldest notification moves its timestamp
+        other = User.objects.create_user(username="other", password="testpass")
+        coalesce([self.event(0, actor=other)])
+        second = self.client.get(first.data["next"])
+        ids = [item["id"] for item in first.data["results"] + second.data["results"]]
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
+
+    def unread(self):
+        return self.client.get(reverse("notifications-unread-count")).data["unread"]
+
+    def test_unread_counter_follows_new_merged_and_read_rows(self):
+        cache.clear()
+        self.assertEqual(self.unread(), 0)
+        coalesce([self.event(1)])
+        other = User.objects.create_user(username="other", password="testpass")
+        coalesce([self.event(1, actor=other)])  # merged: still one unread row
+        self.assertEqual(self.unread(), 1)
+        coalesce([self.event(2)])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 2)
+
+        first = Notification.objects.order_by("id").first()
+        response = self.client.post(reverse("notifications-mark-all-read"), {"up_to": first.id}, format="json")
+        self.assertEqual((response.data["marked"], response.data["unread"]), (1, 1))
+        response = self.client.post(reverse("notifications-mark-all-read"))
+        self.assertEqual((response.data["marked"], response.data["unread"]), (1, 0))
+        self.assertFalse(Notification.objects.filter(unread=True).exists())
+
+    def test_lost_counter_is_recounted(self):
+        coalesce([self.event(1)])
+        cache.clear()
+        self.assertEqual(self.unread(), 1)
@@ -0,0 +1,33 @@
+"""
+Cached per-user unread notification counter.
+
+The count lives in the default cache and is adjusted when notifications are
+created or marked read. A missing key is recomputed from the partial
+(recipient, unread) index, and the timeout bounds any drift.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+
+def _key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def unread_count(user_id):
+    count = cache.get(_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, unread=True).count()
+        cache.set(_key(user_id), count, settings.NOTIFICATIONS_UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def adjust(user_id, delta):
+    if not delta:
+        return
+    try:
+        cache.incr(_key(user_id), delta)
+    except ValueError:
+        # not cached yet; the next read recomputes it
+        pass
@@ -1,7 +1,11 @@
 from django.urls import path
-from .views import NotificationListAPIView, MarkNotificationReadAPIView
+from .stream import notification_stream
+from .views import NotificationListAPIView, MarkNotificationReadAPIView, UnreadCountAPIView, MarkAllNotificationsReadAPIView
 
 urlpatterns = [
     path("", NotificationListAPIView.as_view(), name="notifications-list"),
     path("<int:pk>/read/", MarkNotificationReadAPIView.as_view(), name="notifications-mark-read"),
+    path("unread-count/", UnreadCountAPIView.as_view(), name="notifications-unread-count"),
+    path("read/", MarkAllNotificationsReadAPIView.as_view(), name="notifications-mark-all-read"),
+    path("stream/", notification_stream, name="notifications-stream"),
 ]
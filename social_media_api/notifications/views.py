@@ -1,26 +1,78 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import Max
+from posts.models import Post
 from .serializers import NotificationSerializer
 from .models import Notification
+from .pagination import NotificationCursorPagination
+from . import unread
+from social_media_api.conditional import conditional, make_etag
 
 class NotificationListAPIView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        # new and coalesced notifications move the latest timestamp (an index
+        # lookup on (recipient, -timestamp)); reads move the unread count
+        latest = Notification.objects.filter(recipient=request.user).aggregate(latest=Max("timestamp"))["latest"]
+        etag = make_etag(request, "notifications", latest, unread.unread_count(request.user.id))
+        return conditional(request, lambda: super(NotificationListAPIView, self).list(request, *args, **kwargs), etag)
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user).order_by("-timestamp")
+        # Targets are resolved for the whole page with one query per content
+        # type; posts bring their author along since their __str__ uses it.
+        return (
+            Notification.objects.filter(recipient=self.request.user)
+            .select_related("actor", "recipient")
+            .prefetch_related(GenericPrefetch("target", [Post.objects.select_related("author")]))
+        )
 
 
 class MarkNotificationReadAPIView(generics.UpdateAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
-    queryset = Notification.objects.all()
     lookup_field = "pk"
 
+    def get_queryset(self):
+        return Notification.objects.select_related("actor", "recipient")
+
     def update(self, request, *args, **kwargs):
         notification = self.get_object()
-        if notification.recipient != request.user:
+        if notification.recipient_id != request.user.id:
             return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+        marked = Notification.objects.filter(pk=notification.pk, unread=True).update(unread=False)
+        unread.adjust(request.user.id, -marked)
         notification.unread = False
-        notification.save()
         return Response(self.get_serializer(notification).data, status=status.HTTP_200_OK)
+
+
+class UnreadCountAPIView(APIView):
+    """Cheap unread badge: a cache lookup instead of listing notifications."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread": unread.unread_count(request.user.id)})
+
+
+class MarkAllNotificationsReadAPIView(APIView):
+    """
+    Mark every unread notification as read with a single UPDATE, or only
+    those with ``id <= up_to`` when ``up_to`` is given.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        notifications = Notification.objects.filter(recipient=request.user, unread=True)
+        up_to = request.data.get("up_to")
+        if up_to is not None:
+            try:
+                notifications = notifications.filter(id__lte=int(up_to))
+            except (TypeError, ValueError):
+                return Response({"detail": "up_to must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        marked = notifications.update(unread=False)
+        unread.adjust(request.user.id, -marked)
+        return Response({"marked": marked, "unread": unread.unread_count(request.user.id)})
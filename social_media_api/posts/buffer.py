@@ -0,0 +1,142 @@
+"""
+Write-coalescing buffer for ``Post.likes_count``.
+
+Likes and unlikes still insert/delete their ``Like`` row synchronously, so the
+(user, post) uniqueness is enforced as before. Only the counter change is
+deferred. Once the like commits, its +1/-1 is added to a per-post delta in the
+buffer backend. A background thread flushes the deltas every
+POSTS_LIKE_BUFFER_INTERVAL seconds with one UPDATE per post. A viral post then
+takes one row lock per interval instead of one per like. Pending deltas are
+flushed when the process exits.
+
+``LocalCounterBackend`` keeps deltas in process memory. ``RedisCounterBackend``
+shares them through a Redis hash, so any process may flush. Anything exposing
+``add``/``drain`` can be plugged in through POSTS_LIKE_BUFFER_BACKEND. With
+POSTS_LIKE_BUFFER off, counters are updated inline as before.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+
+from . import cache as post_cache
+from .models import Post
+from .ranking import scorer
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCounterBackend:
+    def __init__(self):
+        self._deltas = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, deltas):
+        with self._lock:
+            self._deltas.update(deltas)
+
+    def drain(self):
+        """Take and reset all pending deltas."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, Counter()
+        return {post_id: delta for post_id, delta in deltas.items() if delta}
+
+
+class RedisCounterBackend:
+    key = "posts:like-deltas"
+
+    def __init__(self):
+        import redis
+
+        self._client = redis.Redis.from_url(settings.REDIS_URL)
+
+    def add(self, deltas):
+        pipe = self._client.pipeline()
+        for post_id, delta in deltas.items():
+            pipe.hincrby(self.key, post_id, delta)
+        pipe.execute()
+
+    def drain(self):
+        pipe = self._client.pipeline()  # MULTI/EXEC: no increment lands between read and delete
+        pipe.hgetall(self.key)
+        pipe.delete(self.key)
+        deltas, _ = pipe.execute()
+        return {int(post_id): int(delta) for post_id, delta in deltas.items() if int(delta)}
+
+
+class LikeCounterBuffer:
+    def __init__(self):
+        self._backend = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(settings.POSTS_LIKE_BUFFER_BACKEND)()
+        return self._backend
+
+    def add(self, post_id, delta):
+        self.add_many([post_id], delta)
+
+    def add_many(self, post_ids, delta):
+        """Apply ``delta`` to the like counters of ``post_ids``."""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        if not settings.POSTS_LIKE_BUFFER:
+            posts = Post.objects.filter(id__in=post_ids)
+            if delta < 0:
+                posts = posts.filter(likes_count__gt=0)
+            posts.update(likes_count=F("likes_count") + delta)
+            scorer.mark_many(post_ids)
+            return
+        self._ensure_started()
+        transaction.on_commit(lambda: self.backend.add({post_id: delta for post_id in post_ids}))
+
+    def flush(self):
+        """Write pending deltas, one UPDATE per post; returns the posts touched."""
+        deltas = self.backend.drain()
+        pending = dict(deltas)
+        try:
+            for post_id, delta in deltas.items():
+                Post.objects.filter(pk=post_id).update(likes_count=Greatest(F("likes_count") + delta, Value(0)))
+                del pending[post_id]
+        except Exception:
+            self.backend.add(pending)
+            raise
+        scorer.mark_many(deltas)
+        post_cache.touch_many(deltas)
+        return len(deltas)
+
+    def shutdown(self):
+        """Flush what this process buffered; registered to run at exit."""
+        if self._worker is not None:
+            self.flush()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="like-counter-buffer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.POSTS_LIKE_BUFFER_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered like counts")
+            finally:
+                close_old_connections()
+
+
+like_counter = LikeCounterBuffer()
+atexit.register(like_counter.shutdown)
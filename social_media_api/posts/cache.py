@@ -0,0 +1,151 @@
+"""
+Versioned response cache for PostViewSet reads.
+
+Cached representations are shared by every viewer. They are serialized with
+``liked_by_me`` left false, and the caller overlays the viewer's likes with
+one indexed query.
+
+- A post body is keyed by ``(id, updated_at, version)``. The version is a
+  per-post counter bumped when its likes or comments change, since those
+  writes do not touch ``updated_at``.
+- A list page is keyed by its absolute URL and a global generation counter
+  bumped on every post, comment or like write.
+
+Stale keys are never deleted; they just stop being read and age out under
+the ``posts`` cache's LRU eviction (or POSTS_CACHE_TIMEOUT). Each bump also
+records when it happened, which serves as the ``Last-Modified`` of the post
+or of the post lists.
+
+The counters and timestamps live in the default cache and expire after
+POSTS_CACHE_MARKER_TIMEOUT (never sooner than the bodies), so Redis does not
+accumulate one per post ever touched. They can still be evicted or expire. A
+lost counter restarts from the clock in nanoseconds rather than from 0, so it
+never repeats a value that keyed an older body or ETag, and a lost timestamp
+restarts at the current time rather than falling back to ``updated_at``; a
+loss only costs cache misses.
+
+Counters kept in a per-process cache would disagree between workers, so the
+body cache is only on (POSTS_CACHE) with REDIS_URL or a single worker.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Like
+
+GENERATION_KEY = "posts:generation"
+MODIFIED_KEY = "posts:modified"
+
+
+def _cache():
+    return caches["posts"]
+
+
+def _markers():
+    return caches["default"]
+
+
+def _marker_timeout():
+    return max(settings.POSTS_CACHE_MARKER_TIMEOUT, settings.POSTS_CACHE_TIMEOUT)
+
+
+def _incr(key):
+    cache = _markers()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), _marker_timeout())
+        return cache.incr(key)
+
+
+def _state(counter_key, modified_key):
+    """(counter, last bump time), starting either if it is missing."""
+    cache = _markers()
+    state = cache.get_many([counter_key, modified_key])
+    if counter_key not in state:
+        cache.add(counter_key, time.time_ns(), _marker_timeout())
+    if modified_key not in state:
+        # the bump it recorded may have been lost; now is never too early
+        cache.add(modified_key, time.time(), _marker_timeout())
+    if len(state) < 2:
+        state = cache.get_many([counter_key, modified_key])
+    return state[counter_key], state[modified_key]
+
+
+def enabled():
+    return settings.POSTS_CACHE
+
+
+def _version_key(post_id):
+    return f"posts:version:{post_id}"
+
+
+def _modified_key(post_id):
+    return f"posts:modified:{post_id}"
+
+
+def touch(post_id):
+    """Invalidate one post's body and every list page once the write commits."""
+    touch_many([post_id])
+
+
+def touch_many(post_ids):
+    post_ids = list(post_ids)
+
+    def bump():
+        for post_id in post_ids:
+            _incr(_version_key(post_id))
+        _incr(GENERATION_KEY)
+        now = time.time()
+        modified = {_modified_key(post_id): now for post_id in post_ids}
+        _markers().set_many({**modified, MODIFIED_KEY: now}, _marker_timeout())
+    transaction.on_commit(bump)
+
+
+def touch_lists():
+    def bump():
+        _incr(GENERATION_KEY)
+        _markers().set(MODIFIED_KEY, time.time(), _marker_timeout())
+    transaction.on_commit(bump)
+
+
+def post_state(post_id):
+    """(version, last bump time) of one post."""
+    return _state(_version_key(post_id), _modified_key(post_id))
+
+
+def lists_state():
+    """(generation, last bump time) shared by all post lists."""
+    return _state(GENERATION_KEY, MODIFIED_KEY)
+
+
+def body_key(post_id, updated_at, version, variant):
+    return f"posts:body:{variant}:{post_id}:{updated_at.timestamp()}:{version}"
+
+
+def page_key(request, generation, variant):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"posts:page:{variant}:{generation}:{url}"
+
+
+def get(key):
+    return _cache().get(key) if enabled() else None
+
+
+def store(key, data):
+    if enabled():
+        _cache().set(key, data, settings.POSTS_CACHE_TIMEOUT)
+
+
+def overlay_liked_by_me(posts, user):
+    """Copy shared post representations with the viewer's ``liked_by_me``."""
+    liked = set()
+    if user.is_authenticated and posts:
+        liked = set(
+            Like.objects.filter(user=user, post_id__in=[post["id"] for post in posts])
+            .order_by().values_list("post_id", flat=True)
+        )
+    return [{**post, "liked_by_me": post["id"] in liked} for post in posts]
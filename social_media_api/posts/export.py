@@ -0,0 +1,155 @@
+"""
+Streaming content export shared by ``ExportAPIView`` and ``export_content``.
+
+Every table is read in primary-key order, in chunks of EXPORT_CHUNK_SIZE rows.
+Each chunk is one ``pk > last`` range query whose cost does not depend on how
+far the export has got. Rows are read as plain values, never as model
+instances. The output is a generator of byte strings that are encoded,
+buffered into blocks of about 64 KB and optionally gzipped as it goes, so
+memory stays bounded whatever the size of the dump. Under ASGI, ``aiterate``
+wraps that generator so each block is read in a worker thread instead of
+Django consuming (and buffering) the whole synchronous iterator at once.
+
+Records, one per NDJSON line (``import_content`` reads the same format)::
+
+    {"type": "user", "id": 1, "username": "...", "email": "...", "bio": "...", "date_joined": "..."}
+    {"type": "follow", "follower": 1, "followee": 2}
+    {"type": "post", "id": 1, "author": 1, "title": "...", "content": "...", "created_at": "...", "updated_at": "..."}
+    {"type": "comment", "id": 1, "post": 1, "author": 2, "content": "...", "created_at": "...", "updated_at": "..."}
+    {"type": "like", "id": 1, "post": 1, "user": 2, "created_at": "..."}
+
+``export_content --passwords`` adds the password hash to user records.
+CSV output has one header row with the union of these columns; a record
+leaves the columns it does not have empty.
+"""
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .models import Comment, Like, Post
+
+User = get_user_model()
+Follow = User.followers.through
+
+BLOCK_SIZE = 64 * 1024
+
+USER_FIELDS = ("id", "username", "email", "bio", "date_joined")
+COLUMNS = (
+    "type", "id", "username", "email", "bio", "date_joined", "password", "follower", "followee",
+    "post", "user", "author", "title", "content", "created_at", "updated_at",
+)
+
+
+def keyset(queryset, fields, chunk_size=None):
+    """Yield ``queryset`` rows as dicts of ``fields``, one pk range at a time."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    queryset = queryset.order_by("pk").values("pk", *fields)
+    last = 0
+    while True:
+        count = 0
+        for row in queryset.filter(pk__gt=last)[:chunk_size].iterator(chunk_size=chunk_size):
+            last = row.pop("pk")
+            count += 1
+            yield row
+        if count < chunk_size:
+            return
+
+
+def records(user=None, passwords=False, chunk_size=None):
+    """All content as export records, or only what ``user`` created."""
+    user_fields = USER_FIELDS + ("password",) if passwords else USER_FIELDS
+    users = User.objects.all() if user is None else User.objects.filter(pk=user.pk)
+    # follow rows: (from_user=B, to_user=A) means A follows B
+    follows = Follow.objects.all() if user is None else Follow.objects.filter(to_user=user)
+    posts = Post.objects.all() if user is None else Post.objects.filter(author=user)
+    comments = Comment.objects.all() if user is None else Comment.objects.filter(author=user)
+    likes = Like.objects.all() if user is None else Like.objects.filter(user=user)
+
+    for row in keyset(users, user_fields, chunk_size):
+        yield {"type": "user", **row}
+    for row in keyset(follows, ("to_user_id", "from_user_id"), chunk_size):
+        yield {"type": "follow", "follower": row["to_user_id"], "followee": row["from_user_id"]}
+    for row in keyset(posts, ("id", "author_id", "title", "content", "created_at", "updated_at"), chunk_size):
+        row["author"] = row.pop("author_id")
+        yield {"type": "post", **row}
+    for row in keyset(comments, ("id", "post_id", "author_id", "content", "created_at", "updated_at"), chunk_size):
+        row["post"], row["author"] = row.pop("post_id"), row.pop("author_id")
+        yield {"type": "comment", **row}
+    for row in keyset(likes, ("id", "post_id", "user_id", "created_at"), chunk_size):
+        row["post"], row["user"] = row.pop("post_id"), row.pop("user_id")
+        yield {"type": "like", **row}
+
+
+def _isoformat(value):
+    # full precision, unlike DjangoJSONEncoder, so a re-import keeps exact timestamps
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_lines(rows):
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_isoformat)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: value.isoformat() if hasattr(value, "isoformat") else value
+                         for key, value in row.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson", "ndjson"),
+    "csv": (csv_lines, "text/csv", "csv"),
+}
+
+
+def encode(lines, compress=False):
+    """UTF-8 encode ``lines`` into ~BLOCK_SIZE byte strings, gzipped if ``compress``."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+    block, size = [], 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            data = b"".join(block)
+            block, size = [], 0
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = b"".join(block)
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def export(output="ndjson", compress=False, **kwargs):
+    """The whole export as an iterator of byte strings; ``kwargs`` go to ``records``."""
+    lines, _, _ = FORMATS[output]
+    return encode(lines(records(**kwargs)), compress)
+
+
+async def aiterate(blocks):
+    """``blocks`` as an async iterator, each ``next()`` run in the thread that owns its connection."""
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while (block := await step(blocks, done)) is not done:
+            yield block
+    finally:
+        await sync_to_async(blocks.close, thread_sensitive=True)()
@@ -0,0 +1,138 @@
+"""
+Materialized home feeds.
+
+Posts are fanned out on write into ``FeedEntry`` rows for every follower of
+the author. Authors with more than ``FEED_FANOUT_MAX_FOLLOWERS`` followers are
+skipped at write time and merged into the feed on read instead (hybrid mode),
+so a single post never has to write millions of rows. Such posts are flagged
+``fanned_out=False`` and stay merged on read until ``absorb`` copies them into
+the followers' feeds, once an unfollow or ``reconcile_follow_counts`` finds the
+author back under the threshold.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import FeedEntry, Post
+
+# Follower sets are read from the database here, never from accounts.graph:
+# another worker's in-memory copy may not have seen a follow yet, and a post
+# missed at write time would never reach that follower's feed.
+User = get_user_model()
+Follow = User.followers.through
+
+
+def is_high_follower(author_id):
+    """Whether the author's posts are merged in on read rather than fanned out."""
+    return User.objects.filter(pk=author_id, followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS).exists()
+
+
+def fan_out_followers(author_id):
+    """Ids of the followers who get the author's new posts, or None for a high-follower author."""
+    if is_high_follower(author_id):
+        return None
+    # follow rows: (from_user=B, to_user=A) means A follows B
+    return list(Follow.objects.filter(from_user_id=author_id).values_list("to_user_id", flat=True))
+
+
+def pulled_authors(user):
+    """
+    Accounts followed by ``user`` whose posts are merged in on read: those
+    above the fan-out threshold now, and those with posts written while they
+    were, which never got feed entries.
+    """
+    # two branches of one UNION, so the second can use post_pulled_author_idx
+    followed = Follow.objects.filter(to_user=user).values("from_user_id")
+    high = User.objects.filter(followers=user, followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+    pulled = Post.objects.filter(fanned_out=False, author__in=followed)
+    return list(
+        high.order_by().values_list("id", flat=True).union(pulled.order_by().values_list("author_id", flat=True))
+    )
+
+
+def fan_out_post(post):
+    """Push a freshly created post into its author's followers' feeds."""
+    follower_ids = fan_out_followers(post.author_id)
+    if follower_ids is None:
+        Post.objects.filter(pk=post.pk).update(fanned_out=False)
+        post.fanned_out = False
+        return 0
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=follower_id, post=post, author_id=post.author_id, created_at=post.created_at)
+            for follower_id in follower_ids
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    return len(follower_ids)
+
+
+def absorb(author_id):
+    """
+    Fan out the author's pulled posts once they are back under the threshold,
+    so their followers' feeds no longer merge them in on read.
+    """
+    with transaction.atomic():
+        posts = list(
+            Post.objects.select_for_update(of=("self",))
+            .filter(author_id=author_id, fanned_out=False,
+                    author__followers_count__lte=settings.FEED_FANOUT_MAX_FOLLOWERS)
+            .values_list("id", "created_at")
+        )
+        if not posts:
+            return 0
+        follower_ids = list(Follow.objects.filter(from_user_id=author_id).values_list("to_user_id", flat=True))
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at)
+                for post_id, created_at in posts
+                for follower_id in follower_ids
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        Post.objects.filter(id__in=[post_id for post_id, _ in posts]).update(fanned_out=True)
+    return len(posts)
+
+
+def backfill(user, author):
+    """Copy the author's recent posts into ``user``'s feed after a follow."""
+    if is_high_follower(author.id):
+        return 0
+    recent = author.posts.order_by("-created_at").values_list("id", "created_at")[: settings.FEED_BACKFILL_LIMIT]
+    entries = [
+        FeedEntry(user=user, post_id=post_id, author=author, created_at=created_at)
+        for post_id, created_at in recent
+    ]
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return len(entries)
+
+
+def trim(user, author):
+    """Drop the author's posts from ``user``'s feed after an unfollow."""
+    deleted, _ = FeedEntry.objects.filter(user=user, author=author).delete()
+    return deleted
+
+
+def feed_queryset(user):
+    """
+    Posts in ``user``'s home feed, newest first, exposing ``feed_at``.
+
+    Without pulled authors (see ``pulled_authors``) this is a range scan over
+    the user's feed entries; otherwise their posts are merged in on read.
+    """
+    pulled = pulled_authors(user)
+    if not pulled:
+        return (
+            Post.objects.filter(feed_entries__user=user)
+            .annotate(feed_at=F("feed_entries__created_at"))
+            .order_by("-feed_at", "-id")
+        )
+    entries = FeedEntry.objects.filter(user=user).values("post_id")
+    return (
+        Post.objects.filter(Q(id__in=entries) | Q(author__in=pulled))
+        .annotate(feed_at=F("created_at"))
+        .order_by("-feed_at", "-id")
+    )
@@ -0,0 +1,327 @@
+import json
+import platform
+import random
+import statistics
+import time
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.graph import graph
+from notifications.models import Notification, NotificationActor
+from posts.models import Comment, FeedEntry, Like, Post
+from posts.ranking import rescore
+from posts.search import get_backend
+
+User = get_user_model()
+Follow = User.followers.through
+
+ENDPOINTS = ["feed", "post_list", "post_detail", "notifications", "like", "comment"]
+BATCH_SIZE = 5000
+
+
+def _percentile(cuts, p):
+    return round(cuts[p - 1] * 1000, 3) if cuts else None
+
+
+def _pg_rows_scanned(connection):
+    """Sequential plus index rows read across user tables (PostgreSQL only)."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute(
+            "SELECT COALESCE(SUM(seq_tup_read), 0) + COALESCE(SUM(idx_tup_fetch), 0) FROM pg_stat_user_tables"
+        )
+        return int(cursor.fetchone()[0])
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database with a synthetic social graph and report per-endpoint "
+        "latency percentiles, queries per request and rows scanned as JSON. Notifications, feed "
+        "scores and like counters are written inline, so their cost is part of each request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--posts", type=int, default=5000)
+        parser.add_argument("--likes", type=int, default=20000)
+        parser.add_argument("--comments", type=int, default=5000)
+        parser.add_argument("--follow-mean", type=float, default=25,
+                            help="Mean number of accounts each user follows (exponentially distributed)")
+        parser.add_argument("--follow-skew", type=float, default=1.0,
+                            help="Zipf exponent of followee popularity; 0 picks followees uniformly")
+        parser.add_argument("--like-skew", type=float, default=1.0,
+                            help="Zipf exponent of post popularity for seeded likes")
+        parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+        parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint")
+        parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                            help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", default="benchmark-report.json")
+        parser.add_argument("--baseline", help="Earlier report to compare p95 latency and queries against")
+        parser.add_argument("--noinput", action="store_false", dest="interactive",
+                            help="Destroy a leftover test database without asking")
+
+    def handle(self, *args, **options):
+        endpoints = [name.strip() for name in options["endpoints"].split(",") if name.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+        if options["requests"] < 2:
+            raise CommandError("--requests must be at least 2 to compute percentiles")
+
+        self.rng = random.Random(options["seed"])
+        connection = connections[DEFAULT_DB_ALIAS]
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        # never touch the configured database: seed and measure a throwaway copy
+        connection.creation.create_test_db(verbosity=0, autoclobber=not options["interactive"], serialize=False)
+        # background writers would outlive the throwaway database (and on
+        # SQLite lock it under the measured requests): do their work inline
+        inline = override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False)
+        try:
+            with inline:
+                for alias in settings.CACHES:
+                    caches[alias].clear()
+                started = time.monotonic()
+                dataset = self.seed(options)
+                self.stdout.write(f"Seeded {dataset} in {time.monotonic() - started:.1f}s")
+                results = {name: self.measure(name, options, connection) for name in endpoints}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "django": django.get_version(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "options": {key: options[key] for key in (
+                    "users", "posts", "likes", "comments", "follow_mean", "follow_skew",
+                    "like_skew", "requests", "warmup", "seed",
+                )},
+            },
+            "dataset": dataset,
+            "endpoints": results,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<14} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                f"p99 {result['p99_ms']:>8.2f}ms  {result['queries_per_request']:>5.1f} queries  "
+                f"{result['errors']} error(s)"
+            )
+        if options["baseline"]:
+            self.compare(options["baseline"], results)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    # -- seeding -----------------------------------------------------------
+
+    def _zipf_weights(self, n, skew):
+        return [1 / (rank + 1) ** skew for rank in range(n)]
+
+    def seed(self, options):
+        rng = self.rng
+        password = make_password("benchmark")
+        User.objects.bulk_create(
+            [User(username=f"bench{i}", email=f"bench{i}@example.com", password=password)
+             for i in range(options["users"])],
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+        if len(user_ids) < 2:
+            raise CommandError("--users must be at least 2")
+
+        # out-degree is exponential around --follow-mean; followees are drawn
+        # from a Zipf popularity ranking over a shuffled copy of the users
+        popular = user_ids[:]
+        rng.shuffle(popular)
+        weights = self._zipf_weights(len(popular), options["follow_skew"])
+        followers = {user_id: [] for user_id in user_ids}
+        follows = []
+        for user_id in user_ids:
+            degree = min(len(user_ids) - 1, round(rng.expovariate(1 / options["follow_mean"])))
+            followees = set(rng.choices(popular, weights, k=degree)) - {user_id}
+            for followee_id in followees:
+                followers[followee_id].append(user_id)
+                follows.append(Follow(from_user_id=followee_id, to_user_id=user_id))
+        Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+
+        Post.objects.bulk_create(
+            [Post(author_id=rng.choice(user_ids), title=f"Post {i}", content=f"benchmark post {i} " * 8)
+             for i in range(options["posts"])],
+            batch_size=BATCH_SIZE,
+        )
+        posts = list(Post.objects.order_by("id").values_list("id", "author_id", "created_at"))
+        post_ids = [post_id for post_id, _, _ in posts]
+        authors = {post_id: author_id for post_id, author_id, _ in posts}
+
+        # same fan-out rule as posts.feed, applied in bulk
+        entries = []
+        for post_id, author_id, created_at in posts:
+            if len(followers[author_id]) <= settings.FEED_FANOUT_MAX_FOLLOWERS:
+                entries += [FeedEntry(user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at)
+                            for follower_id in followers[author_id]]
+            if len(entries) >= BATCH_SIZE:
+                FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+                entries = []
+        FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        Post.objects.filter(
+            author_id__in=[user_id for user_id in user_ids if len(followers[user_id]) > settings.FEED_FANOUT_MAX_FOLLOWERS]
+        ).update(fanned_out=False)
+
+        self.liked = set()
+        if post_ids:
+            weights = self._zipf_weights(len(post_ids), options["like_skew"])
+            for _ in range(options["likes"]):
+                self.liked.add((rng.choice(user_ids), rng.choices(post_ids, weights)[0]))
+        Like.objects.bulk_create(
+            [Like(user_id=user_id, post_id=post_id) for user_id, post_id in self.liked],
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+
+        comments, notifications = [], []
+        post_type = ContentType.objects.get_for_model(Post)
+        for i in range(options["comments"] if post_ids else 0):
+            author_id, post_id = rng.choice(user_ids), rng.choice(post_ids)
+            comments.append(Comment(post_id=post_id, author_id=author_id, content=f"benchmark comment {i}"))
+            if authors[post_id] != author_id:
+                notifications.append(Notification(
+                    recipient_id=authors[post_id], actor_id=author_id, verb="commented on your post",
+                    target_content_type=post_type, target_object_id=str(post_id),
+                ))
+        Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        NotificationActor.objects.bulk_create(
+            [NotificationActor(notification=row, actor_id=row.actor_id) for row in notifications],
+            batch_size=BATCH_SIZE,
+        )
+
+        # bulk inserts skip the signals: rebuild everything they maintain
+        call_command("reconcile_counters", stdout=StringIO())
+        call_command("reconcile_follow_counts", stdout=StringIO())
+        for start in range(0, len(post_ids), 500):
+            rescore(post_ids[start:start + 500])
+        get_backend().rebuild()
+        graph.invalidate()
+
+        self.user_ids, self.post_ids = user_ids, post_ids
+        viewers = self.rng.sample(user_ids, min(50, len(user_ids)))
+        self.clients = {}
+        for user_id in viewers:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user_id=user_id).key}")
+            self.clients[user_id] = client
+        return {
+            "users": len(user_ids),
+            "follows": len(follows),
+            "posts": len(post_ids),
+            "feed_entries": FeedEntry.objects.count(),
+            "likes": len(self.liked),
+            "comments": len(comments),
+            "notifications": len(notifications),
+        }
+
+    # -- measuring ---------------------------------------------------------
+
+    def request_for(self, name):
+        viewer = self.rng.choice(list(self.clients))
+        client = self.clients[viewer]
+        if name == "feed":
+            return lambda: client.get("/api/posts/feed/", secure=True)
+        if name == "post_list":
+            return lambda: client.get("/api/posts/posts/", secure=True)
+        if name == "post_detail":
+            post_id = self.rng.choice(self.post_ids)
+            return lambda: client.get(f"/api/posts/posts/{post_id}/", secure=True)
+        if name == "notifications":
+            return lambda: client.get("/api/notifications/", secure=True)
+        if name == "like":
+            viewers = self.rng.sample(list(self.clients), len(self.clients))
+            for viewer in viewers:
+                post_id = self.unliked_post(viewer)
+                if post_id is not None:
+                    break
+            else:
+                raise CommandError("Every viewer has liked every post; raise --posts or lower --requests")
+            client = self.clients[viewer]
+            self.liked.add((viewer, post_id))
+            return lambda: client.post(f"/api/posts/posts/{post_id}/like/", secure=True)
+        post_id = self.rng.choice(self.post_ids)
+        return lambda: client.post("/api/posts/comments/", {"post": post_id, "content": "benchmark"}, secure=True)
+
+    def unliked_post(self, viewer):
+        """A random post ``viewer`` has not liked, or None once they have liked them all."""
+        for _ in range(100):
+            post_id = self.rng.choice(self.post_ids)
+            if (viewer, post_id) not in self.liked:
+                return post_id
+        # nearly all liked: pick from what is left rather than keep guessing
+        left = [post_id for post_id in self.post_ids if (viewer, post_id) not in self.liked]
+        return self.rng.choice(left) if left else None
+
+    def measure(self, name, options, connection):
+        for _ in range(options["warmup"]):
+            self.request_for(name)()
+
+        pg = connection.vendor == "postgresql"
+        scanned_before = _pg_rows_scanned(connection) if pg else None
+        timings, queries, errors = [], 0, 0
+        for _ in range(options["requests"]):
+            send = self.request_for(name)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = send()
+                timings.append(time.perf_counter() - started)
+            queries += len(captured)
+            errors += response.status_code >= 400
+
+        rows_scanned = None
+        if pg:
+            # statistics reach pg_stat_* asynchronously after each transaction
+            time.sleep(1)
+            rows_scanned = round((_pg_rows_scanned(connection) - scanned_before) / options["requests"], 1)
+
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "requests": options["requests"],
+            "errors": errors,
+            "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+            "p50_ms": _percentile(cuts, 50),
+            "p95_ms": _percentile(cuts, 95),
+            "p99_ms": _percentile(cuts, 99),
+            "requests_per_second": round(len(timings) / sum(timings), 1),
+            "queries_per_request": round(queries / options["requests"], 2),
+            "rows_scanned_per_request": rows_scanned,
+        }
+
+    def compare(self, path, results):
+        with open(path) as fh:
+            baseline = json.load(fh)["endpoints"]
+        self.stdout.write(f"Compared with {path}:")
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0
+            self.stdout.write(
+                f"{name:<14} p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f}ms ({change:+.1f}%)  "
+                f"queries {before['queries_per_request']} -> {result['queries_per_request']}"
+            )
@@ -0,0 +1,45 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = "Stream users, follows, posts, comments and likes to NDJSON or CSV in bounded memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", default="-", help="File to write, - for stdout (default)")
+        parser.add_argument("--format", choices=sorted(export.FORMATS), default="ndjson", dest="output_format")
+        parser.add_argument("--user", help="Only export content created by this username")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip")
+        parser.add_argument("--passwords", action="store_true",
+                            help="Include password hashes, so import_content can restore logins")
+        parser.add_argument("--chunk-size", type=int, help="Rows per keyset query (default EXPORT_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        blocks = export.export(
+            options["output_format"], options["gzip"],
+            user=user, passwords=options["passwords"], chunk_size=options["chunk_size"],
+        )
+        out = sys.stdout.buffer if options["output"] == "-" else open(options["output"], "wb")
+        written = 0
+        try:
+            for block in blocks:
+                out.write(block)
+                written += len(block)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+            else:
+                out.flush()
+        if options["output"] != "-":
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,260 @@
+import gzip
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, identify_hasher, make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.graph import graph
+from posts import cache as post_cache
+from posts import feed
+from posts.models import Comment, FeedEntry, Like, Post
+from posts.ranking import hot_score, rescore
+from posts.search import get_backend
+
+User = get_user_model()
+Follow = User.followers.through
+
+# records of a later phase may reference those of earlier ones
+PHASES = {"user": 0, "follow": 1, "post": 2, "comment": 3, "like": 3}
+
+
+def _timestamp(value):
+    return parse_datetime(value) if value else timezone.now()
+
+
+@contextmanager
+def _keep_timestamps(*models):
+    """Store the exported created_at/updated_at instead of auto_now(_add) values."""
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _defer_constraints():
+    # Django's foreign keys are created DEFERRABLE INITIALLY DEFERRED; be explicit
+    # so rows may reference others later in the same batch
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA defer_foreign_keys = ON")
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load users, follows, posts, comments and likes from NDJSON, as written by export_content. "
+        "Records must come grouped in that order."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, optionally gzipped; - for stdin")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk_create transaction")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Batches written in parallel, each on its own connection (1 on SQLite)")
+        parser.add_argument("--skip-existing", action="store_true",
+                            help="Ignore rows that conflict with existing ones, so an import can be rerun")
+        parser.add_argument("--default-password",
+                            help="Password for users without a password hash (hashed once); "
+                                 "otherwise they get an unusable password")
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.ignore_conflicts = options["skip_existing"]
+        self.default_password = make_password(options["default_password"])
+        workers = options["workers"]
+        if connection.vendor == "sqlite" and workers > 1:
+            self.stderr.write("SQLite serializes writers; importing with one worker")
+            workers = 1
+
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.engaged_post_ids = set()
+        started = time.monotonic()
+        with _keep_timestamps(Post, Comment, Like), self.open(options["path"]) as lines:
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    self.load(lines, pool, workers)
+            else:
+                self.load(lines, None, workers)
+        loaded = time.monotonic() - started
+
+        self.stdout.write("Rebuilding counters, feed scores and the search index...")
+        self.finish()
+        total = time.monotonic() - started
+
+        for kind in PHASES:
+            if self.counts[kind]:
+                self.stdout.write(f"  {kind}: {self.counts[kind]}")
+        rows = sum(self.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {rows} records in {loaded:.1f}s ({rows / max(loaded, 1e-9):.0f} records/s), "
+            f"{total:.1f}s including the rebuild"
+        ))
+
+    @contextmanager
+    def open(self, path):
+        raw = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            stream = gzip.GzipFile(fileobj=raw) if raw.peek(2)[:2] == b"\x1f\x8b" else raw
+            yield (line for line in stream if line.strip())
+        finally:
+            if raw is not sys.stdin.buffer:
+                raw.close()
+
+    def load(self, lines, pool, workers):
+        """Batch consecutive records of one type; wait for each phase before the next."""
+        pending, batch, kind = set(), [], None
+
+        def submit():
+            if not batch:
+                return
+            if pool is None:
+                self.write(kind, batch)
+                return
+            # bound the memory held by queued batches
+            while len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                self.collect(done, pending)
+            pending.add(pool.submit(self.write_in_worker, kind, batch))
+
+        for number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+                record_kind = record["type"]
+                phase = PHASES[record_kind]
+            except (ValueError, KeyError) as exc:
+                raise CommandError(f"Line {number}: not an export record ({exc})")
+            if record_kind != kind or len(batch) >= self.batch_size:
+                submit()
+                if kind is not None and phase != PHASES[kind]:
+                    self.collect(wait(pending).done, pending)
+                    if kind == "follow":
+                        # the fan-out threshold reads User.followers_count
+                        call_command("reconcile_follow_counts", stdout=StringIO())
+                batch, kind = [], record_kind
+            batch.append(record)
+        submit()
+        self.collect(wait(pending).done, pending)
+
+    def collect(self, done, pending):
+        for future in done:
+            pending.discard(future)
+            future.result()  # re-raise a failed batch
+
+    def write(self, kind, records):
+        """One batch in one transaction, so each bulk insert commits only once."""
+        with transaction.atomic():
+            _defer_constraints()
+            getattr(self, f"build_{kind}")(records)
+        with self.lock:
+            self.counts[kind] += len(records)
+
+    def write_in_worker(self, kind, records):
+        try:
+            self.write(kind, records)
+        finally:
+            connection.close()  # this worker thread's own connection
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size, ignore_conflicts=self.ignore_conflicts)
+
+    def password(self, value):
+        if not value:
+            return self.default_password
+        if value.startswith(UNUSABLE_PASSWORD_PREFIX):
+            return value  # an account without a login must stay that way
+        try:
+            identify_hasher(value)
+        except ValueError:
+            return make_password(value)  # plain text: the slow path pre-hashed exports avoid
+        return value
+
+    def build_user(self, records):
+        self.bulk_create(User, [
+            User(id=record["id"], username=record["username"], email=record.get("email") or "",
+                 bio=record.get("bio"), password=self.password(record.get("password")),
+                 date_joined=_timestamp(record.get("date_joined")))
+            for record in records
+        ])
+
+    def build_follow(self, records):
+        # (from_user=B, to_user=A) means A follows B
+        self.bulk_create(Follow, [
+            Follow(from_user_id=record["followee"], to_user_id=record["follower"]) for record in records
+        ])
+
+    def build_post(self, records):
+        # same fan-out rule as posts.feed, looked up once per author in the batch
+        followers = {author_id: feed.fan_out_followers(author_id) for author_id in {r["author"] for r in records}}
+        posts = [
+            Post(id=record["id"], author_id=record["author"], title=record["title"], content=record["content"],
+                 created_at=_timestamp(record.get("created_at")),
+                 updated_at=_timestamp(record.get("updated_at") or record.get("created_at")),
+                 fanned_out=followers[record["author"]] is not None)
+            for record in records
+        ]
+        for post in posts:
+            # the score without engagement; finish() rescores posts that get likes or comments
+            post.score = hot_score(0, 0, post.created_at)
+        self.bulk_create(Post, posts)
+        entries = [
+            FeedEntry(user_id=follower_id, post_id=post.id, author_id=post.author_id, created_at=post.created_at)
+            for post in posts for follower_id in followers[post.author_id] or ()
+        ]
+        FeedEntry.objects.bulk_create(entries, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def build_comment(self, records):
+        with self.lock:
+            self.engaged_post_ids.update(record["post"] for record in records)
+        self.bulk_create(Comment, [
+            Comment(id=record.get("id"), post_id=record["post"], author_id=record["author"],
+                    content=record["content"], created_at=_timestamp(record.get("created_at")),
+                    updated_at=_timestamp(record.get("updated_at") or record.get("created_at")))
+            for record in records
+        ])
+
+    def build_like(self, records):
+        with self.lock:
+            self.engaged_post_ids.update(record["post"] for record in records)
+        self.bulk_create(Like, [
+            Like(id=record.get("id"), post_id=record["post"], user_id=record["user"],
+                 created_at=_timestamp(record.get("created_at")))
+            for record in records
+        ])
+
+    def finish(self):
+        """Bulk inserts skip the signals: rebuild everything they maintain."""
+        # explicit ids leave the sequences behind on PostgreSQL
+        statements = connection.ops.sequence_reset_sql(no_style(), [User, Follow, Post, Comment, Like])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+        call_command("reconcile_counters", stdout=StringIO())
+        call_command("reconcile_follow_counts", stdout=StringIO())
+        engaged = sorted(self.engaged_post_ids)
+        for start in range(0, len(engaged), 500):
+            rescore(engaged[start:start + 500])
+        get_backend().rebuild()
+        graph.invalidate()
+        post_cache.touch_lists()
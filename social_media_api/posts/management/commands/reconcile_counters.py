@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.buffer import like_counter
+from posts.models import Post, Comment, Like
+
+
+def _count_subquery(model):
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class Command(BaseCommand):
+    help = "Repair drift in the denormalized Post.likes_count / Post.comments_count columns"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Number of post ids updated per statement")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # apply buffered like deltas first so they are not counted twice
+        like_counter.flush()
+        max_id = Post.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+
+        drifted = Post.objects.annotate(
+            actual_likes=_count_subquery(Like),
+            actual_comments=_count_subquery(Comment),
+        ).filter(~Q(likes_count=F("actual_likes")) | ~Q(comments_count=F("actual_comments")))
+
+        fixed = 0
+        # walk the id space in ranges so each UPDATE only locks one batch
+        for start in range(0, max_id, batch_size):
+            fixed += drifted.filter(id__gt=start, id__lte=start + batch_size).update(
+                likes_count=_count_subquery(Like),
+                comments_count=_count_subquery(Comment),
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled counters on {fixed} post(s)"))
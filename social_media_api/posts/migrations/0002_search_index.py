@@ -0,0 +1,52 @@
+"""
+Full-text search index for posts.search, created for the database vendor.
+
+PostgreSQL gets a GIN index on ``search_vector`` (declaring it in Post.Meta
+would break SQLite) and the column is filled for existing posts. SQLite gets
+the FTS5 table mirrored by SQLiteSearchBackend. Other databases get nothing.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+GIN_INDEX = "post_search_vector_idx"
+FTS_TABLE = "posts_post_fts"
+
+
+def create_index(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    table = schema_editor.quote_name(Post._meta.db_table)
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON {table} USING gin (search_vector)")
+        config = settings.POSTS_SEARCH_CONFIG
+        Post.objects.using(schema_editor.connection.alias).update(
+            search_vector=SearchVector("title", weight="A", config=config)
+            + SearchVector("content", weight="B", config=config)
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, content, tokenize='porter unicode61')"
+        )
+        # a database set up before this migration may already have the table
+        schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE} (rowid, title, content) SELECT id, title, content FROM {table}")
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 
 User = settings.AUTH_USER_MODEL
 
@@ -9,9 +10,25 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # denormalized counters, kept in sync by posts.signals (see reconcile_counters)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # time-decayed engagement score for the ranked feed, see posts.ranking
+    score = models.FloatField(default=0, editable=False)
+    # False when posts.feed skipped fan-out for a high-follower author; such
+    # posts are always merged into followers' feeds on read
+    fanned_out = models.BooleanField(default=True, editable=False)
+    # PostgreSQL full-text document, maintained by posts.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+            models.Index(fields=["author", "-created_at"], name="post_author_created_idx"),
+            models.Index(fields=["-score", "-id"], name="post_score_id_idx"),
+            models.Index(fields=["author"], condition=models.Q(fanned_out=False), name="post_pulled_author_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.author}"
@@ -41,3 +58,26 @@ class Like(models.Model):
 
     def __str__(self):
         return f"{self.user} liked {self.post_id}"
+
+
+class FeedEntry(models.Model):
+    """
+    Materialized home-feed row: one per (follower, post) written at post time
+    so a timeline read is a single range scan on (user, created_at).
+    """
+    user = models.ForeignKey(User, related_name="feed_entries", on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name="feed_entries", on_delete=models.CASCADE)
+    # denormalized from the post so backfill/trim and ordering never join posts
+    author = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="feedentry_user_created_idx"),
+            models.Index(fields=["user", "author"], name="feedentry_user_author_idx"),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} in feed of {self.user_id}"
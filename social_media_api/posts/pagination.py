@@ -0,0 +1,92 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PostCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id): each page is an index range scan
+    starting after the previous cursor, with no OFFSET and no COUNT(*).
+    """
+    ordering = ("-created_at", "-id")
+
+
+class FeedCursorPagination(CursorPagination):
+    ordering = ("-feed_at", "-id")
+
+
+class TopFeedCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the live (score, id). A post re-scored while the
+    client pages can be skipped or repeated; TopFeedSnapshotPagination avoids
+    that wherever the cache is shared.
+    """
+    ordering = ("-score", "-id")
+
+
+class TopFeedSnapshotPagination(BasePagination):
+    """
+    Pages through a snapshot of the ranking taken on the first page.
+
+    The first request stores the ids of the top FEED_TOP_SNAPSHOT_SIZE posts
+    in the cache for FEED_TOP_SNAPSHOT_TIMEOUT seconds, and the ``next`` /
+    ``previous`` links carry its token and an offset into it. Scores that
+    change while the client pages no longer move posts across pages. A link
+    whose snapshot has expired answers 404.
+    """
+    page_size = api_settings.PAGE_SIZE
+    snapshot_query_param = "snapshot"
+    offset_query_param = "offset"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        token = request.query_params.get(self.snapshot_query_param)
+        if token is None:
+            self.token = secrets.token_urlsafe(12)
+            self.ids = list(queryset.values_list("id", flat=True)[: settings.FEED_TOP_SNAPSHOT_SIZE])
+            cache.set(self.key(request, self.token), self.ids, settings.FEED_TOP_SNAPSHOT_TIMEOUT)
+            self.offset = 0
+        else:
+            self.token = token
+            self.ids = cache.get(self.key(request, token))
+            try:
+                self.offset = max(int(request.query_params.get(self.offset_query_param, 0)), 0)
+            except ValueError:
+                self.ids = None
+            if self.ids is None:
+                raise NotFound("This ranking has expired; start again from the first page.")
+        page_ids = self.ids[self.offset:self.offset + self.page_size]
+        posts = {post.id: post for post in queryset.order_by().filter(id__in=page_ids)}
+        return [posts[post_id] for post_id in page_ids if post_id in posts]
+
+    def key(self, request, token):
+        return f"posts:top:{request.user.pk}:{token}"
+
+    def get_link(self, offset):
+        url = replace_query_param(self.request.build_absolute_uri(), self.snapshot_query_param, self.token)
+        if offset == 0:
+            return remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.offset_query_param, offset)
+
+    def get_next_link(self):
+        if self.offset + self.page_size >= len(self.ids):
+            return None
+        return self.get_link(self.offset + self.page_size)
+
+    def get_previous_link(self):
+        if self.offset == 0:
+            return None
+        return self.get_link(max(self.offset - self.page_size, 0))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+
+class CommentCursorPagination(CursorPagination):
+    ordering = ("created_at", "id")
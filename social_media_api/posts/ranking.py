@@ -0,0 +1,90 @@
+"""
+Engagement ranking for the "top" feed.
+
+Each post stores a time-decayed ``score``:
+
+    log10(max(likes + 2 * comments, 1)) + created_at / FEED_RANKING_DECAY
+
+The recency term grows with creation time, so a post never has to be
+re-scored just because time passes. A post needs ten times the engagement to
+rank level with one FEED_RANKING_DECAY seconds newer. Likes and comments mark
+a post dirty. A background thread re-scores dirty posts in batches from the
+denormalized counters, so ranking never aggregates likes or comments at
+request time.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, FloatField, Value, When
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def hot_score(likes_count, comments_count, created_at):
+    engagement = max(likes_count + 2 * comments_count, 1)
+    return math.log10(engagement) + created_at.timestamp() / settings.FEED_RANKING_DECAY
+
+
+def rescore(post_ids):
+    """Recompute and store the score of the given posts with one UPDATE."""
+    rows = Post.objects.filter(id__in=post_ids).values_list("id", "likes_count", "comments_count", "created_at")
+    scores = {post_id: hot_score(likes, comments, created_at) for post_id, likes, comments, created_at in rows}
+    if scores:
+        Post.objects.filter(id__in=scores).update(
+            score=Case(*[When(id=post_id, then=Value(score)) for post_id, score in scores.items()],
+                       output_field=FloatField())
+        )
+
+
+class PostScorer:
+    def __init__(self):
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def mark(self, post_id):
+        """Queue a post for re-scoring once the current transaction commits."""
+        self.mark_many([post_id])
+
+    def mark_many(self, post_ids):
+        post_ids = list(post_ids)
+        if not settings.FEED_RANKING_ASYNC:
+            transaction.on_commit(lambda: rescore(post_ids))
+            return
+        self._ensure_started()
+        transaction.on_commit(lambda: self._add(post_ids))
+
+    def _add(self, post_ids):
+        with self._lock:
+            self._dirty.update(post_ids)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="post-scorer", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.FEED_RANKING_INTERVAL)
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            dirty = list(dirty)
+            try:
+                for start in range(0, len(dirty), 500):
+                    rescore(dirty[start:start + 500])
+            except Exception:
+                logger.exception("Failed to re-score %d post(s)", len(dirty))
+                with self._lock:
+                    self._dirty.update(dirty)
+            finally:
+                close_old_connections()
+
+
+scorer = PostScorer()
@@ -0,0 +1,121 @@
+"""
+Pluggable full-text search over post titles and content.
+
+PostgreSQL keeps a weighted ``Post.search_vector`` (title A, content B) behind
+a GIN index and ranks with ``ts_rank``. SQLite mirrors posts into an FTS5
+table, ``posts_post_fts``, and ranks with ``bm25``. Any other database falls
+back to ``icontains`` matching. Both indexes are created and backfilled by
+migration ``posts.0002_search_index`` and kept in sync by the post save/delete
+signals.
+
+Set POSTS_SEARCH_BACKEND to a dotted class path to choose a backend explicitly.
+"""
+import functools
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+VENDOR_BACKENDS = {
+    "postgresql": "posts.search.PostgresSearchBackend",
+    "sqlite": "posts.search.SQLiteSearchBackend",
+}
+
+
+class BasicSearchBackend:
+    """Unindexed substring match, for databases without full-text support."""
+
+    def rebuild(self, using=DEFAULT_DB_ALIAS):
+        pass
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def search(self, queryset, query):
+        return (
+            queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
+            .annotate(search_rank=Value(0.0, output_field=FloatField()))
+            .order_by("-created_at", "-id")
+        )
+
+
+class PostgresSearchBackend(BasicSearchBackend):
+    def vector(self):
+        config = settings.POSTS_SEARCH_CONFIG
+        return SearchVector("title", weight="A", config=config) + SearchVector("content", weight="B", config=config)
+
+    def rebuild(self, using=DEFAULT_DB_ALIAS):
+        Post.objects.using(using).update(search_vector=self.vector())
+
+    def index(self, post):
+        Post.objects.filter(pk=post.pk).update(search_vector=self.vector())
+
+    def search(self, queryset, query):
+        query = SearchQuery(query, search_type="websearch", config=settings.POSTS_SEARCH_CONFIG)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-id")
+        )
+
+
+class SQLiteSearchBackend(BasicSearchBackend):
+    table = "posts_post_fts"
+
+    def rebuild(self, using=DEFAULT_DB_ALIAS):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, content) SELECT id, title, content FROM {Post._meta.db_table}"
+            )
+
+    def index(self, post):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)",
+                [post.pk, post.title, post.content],
+            )
+
+    def remove(self, post_id):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [post_id])
+
+    def search(self, queryset, query):
+        # quote every term so user input can't break FTS5 query syntax
+        terms = ['"{}"'.format(term.replace('"', '""')) for term in re.findall(r"\w+", query)]
+        if not terms:
+            return queryset.none()
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({self.table}, 10.0, 1.0) AS rank FROM {self.table} "
+                f"WHERE {self.table} MATCH %s ORDER BY rank LIMIT %s",
+                [" ".join(terms), settings.POSTS_SEARCH_MAX_RESULTS],
+            )
+            # bm25 is lower-is-better; negate so search_rank sorts like ts_rank
+            ranks = {post_id: -rank for post_id, rank in cursor.fetchall()}
+        if not ranks:
+            return queryset.none()
+        return (
+            queryset.filter(id__in=ranks)
+            .annotate(search_rank=Case(
+                *[When(id=post_id, then=Value(rank)) for post_id, rank in ranks.items()],
+                output_field=FloatField(),
+            ))
+            .order_by("-search_rank", "-id")
+        )
+
+
+@functools.cache
+def get_backend():
+    path = settings.POSTS_SEARCH_BACKEND or VENDOR_BACKENDS.get(
+        connections[DEFAULT_DB_ALIAS].vendor, "posts.search.BasicSearchBackend"
+    )
+    return import_string(path)()
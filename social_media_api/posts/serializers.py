@@ -1,11 +1,14 @@
 from rest_framework import serializers
+from request_metrics.drf import TimedSerializerMixin
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import models
 from .models import Post, Comment, Like
 
 User = get_user_model()
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(read_only=True, slug_field="username")
 
     class Meta:
@@ -14,15 +17,31 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "author", "created_at", "updated_at")
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Resolves the viewer's likes for a whole page of posts with a single query
+    and hands the ids to each child through the serializer context.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get("request")
+        if "liked_post_ids" not in self.context and request and request.user.is_authenticated:
+            self._context["liked_post_ids"] = set(
+                Like.objects.filter(user=request.user, post__in=[post.pk for post in posts])
+                .order_by().values_list("post_id", flat=True)
+            )
+        return super().to_representation(posts)
+
+
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(read_only=True, slug_field="username")
     comments = CommentSerializer(many=True, read_only=True)
-    comments_count = serializers.SerializerMethodField()
-    likes_count = serializers.SerializerMethodField()
     liked_by_me = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
+        list_serializer_class = PostListSerializer
         fields = (
             "id",
             "author",
@@ -46,19 +65,29 @@ class PostSerializer(serializers.ModelSerializer):
             "liked_by_me",
         )
 
-    def get_comments_count(self, obj):
-        return obj.comments.count()
-
-    def get_likes_count(self, obj):
-        return obj.likes.count()
-
     def get_liked_by_me(self, obj):
+        liked_post_ids = self.context.get("liked_post_ids")
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
         request = self.context.get("request")
         if request and request.user.is_authenticated:
             return obj.likes.filter(user=request.user).exists()
         return False
 
 
+class LatestCommentsPostSerializer(PostSerializer):
+    """
+    PostSerializer variant for ``?comments=latest``: embeds only the newest
+    comments prefetched into ``latest_comments`` and links to the full,
+    paginated list.
+    """
+    comments = CommentSerializer(source="latest_comments", many=True, read_only=True)
+    comments_url = serializers.HyperlinkedIdentityField(view_name="post-comments")
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ("comments_url",)
+
+
 class LikeSerializer(serializers.ModelSerializer):
     user = serializers.SlugRelatedField(read_only=True, slug_field="username")
 
@@ -66,3 +95,14 @@ class LikeSerializer(serializers.ModelSerializer):
         model = Like
         fields = ("id", "post", "user", "created_at")
         read_only_fields = ("id", "user", "created_at")
+
+
+class PostIdsSerializer(serializers.Serializer):
+    post_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.POSTS_BULK_MAX_IDS,
+    )
+
+    def validate_post_ids(self, value):
+        return list(dict.fromkeys(value))
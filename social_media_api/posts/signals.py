@@ -1,18 +1,74 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Comment, Like
-from django.contrib.contenttypes.models import ContentType
-from notifications.models import Notification
+from .models import Post, Comment, Like
+from notifications.dispatch import notify
+from . import feed
+from .ranking import scorer
+from .search import get_backend
+from . import cache as post_cache
+from .buffer import like_counter
+
+@receiver(post_save, sender=Post)
+def fan_out_on_create(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out_post(instance)
+        scorer.mark(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_for_search(sender, instance, **kwargs):
+    get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search(sender, instance, **kwargs):
+    get_backend().remove(instance.pk)
+
 
 @receiver(post_save, sender=Comment)
 def notify_on_comment(sender, instance, created, **kwargs):
     if created:
         post = instance.post
-        if post.author != instance.author:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=instance.author,
+        if post.author_id != instance.author_id:
+            notify(
+                recipient_id=post.author_id,
+                actor_id=instance.author_id,
                 verb="commented on your post",
-                target_content_type=ContentType.objects.get_for_model(post),
-                target_object_id=str(post.id),
+                target=post,
             )
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comments_count=F("comments_count") + 1)
+        scorer.mark(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(comments_count=F("comments_count") - 1)
+    scorer.mark(instance.post_id)
+
+
+@receiver(post_save, sender=Like)
+def increment_likes_count(sender, instance, created, **kwargs):
+    if created:
+        like_counter.add(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Like)
+def decrement_likes_count(sender, instance, **kwargs):
+    like_counter.add(instance.post_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_pages(sender, **kwargs):
+    post_cache.touch_lists()
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Like)
+def invalidate_cached_post(sender, instance, **kwargs):
+    post_cache.touch(instance.post_id)
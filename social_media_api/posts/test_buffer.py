@@ -0,0 +1,63 @@
+from unittest import mock
+from django.db import DatabaseError
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from accounts.models import User
+from .buffer import LocalCounterBackend, like_counter
+from .models import Post
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, SECURE_SSL_REDIRECT=False,
+                   POSTS_LIKE_BUFFER=True, POSTS_LIKE_BUFFER_INTERVAL=3600,
+                   POSTS_LIKE_BUFFER_BACKEND="posts.buffer.LocalCounterBackend")
+class LikeCounterBufferTestCase(APITestCase):
+    def setUp(self):
+        like_counter.backend.drain()
+        self.author = User.objects.create_user(username="author", password="testpass")
+        self.post = Post.objects.create(author=self.author, title="Post", content="content")
+
+    def likes_count(self):
+        return Post.objects.get(pk=self.post.pk).likes_count
+
+    def like(self, username, action="post-like"):
+        user = User.objects.get_or_create(username=username)[0]
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(action, args=[self.post.id]))
+
+    def test_likes_are_counted_on_flush(self):
+        for username in ("alice", "bob", "carol"):
+            self.like(username)
+        self.like("bob", "post-unlike")
+        self.assertEqual(self.likes_count(), 0)
+        self.assertEqual(like_counter.flush(), 1)
+        self.assertEqual(self.likes_count(), 2)
+        self.assertEqual(like_counter.flush(), 0)
+
+    def test_failed_flush_keeps_the_deltas(self):
+        self.like("alice")
+        with mock.patch("posts.buffer.Post.objects.filter", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                like_counter.flush()
+        self.assertEqual(like_counter.flush(), 1)
+        self.assertEqual(self.likes_count(), 1)
+
+    def test_counter_never_goes_negative(self):
+        like_counter.backend.add({self.post.id: -3})
+        like_counter.flush()
+        self.assertEqual(self.likes_count(), 0)
+
+    def test_rolled_back_like_is_not_buffered(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            like_counter.add(self.post.id, 1)
+        self.assertEqual(like_counter.flush(), 0)
+
+
+class LocalCounterBackendTestCase(SimpleTestCase):
+    def test_drain_resets_and_drops_zero_deltas(self):
+        backend = LocalCounterBackend()
+        backend.add({1: 1, 2: 1})
+        backend.add({1: 1, 2: -1})
+        self.assertEqual(backend.drain(), {1: 2})
+        self.assertEqual(backend.drain(), {})
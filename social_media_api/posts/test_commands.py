@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from .models import Comment, FeedEntry, Like, Post
+from .search import get_backend
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+class BenchmarkCommandTestCase(SimpleTestCase):
+    def test_benchmark_runs_end_to_end(self):
+        # a separate process with the default settings, background workers included
+        with tempfile.TemporaryDirectory() as tmp:
+            report = Path(tmp) / "report.json"
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{Path(tmp) / 'db.sqlite3'}"}
+            for name in ("NOTIFICATIONS_ASYNC", "FEED_RANKING_ASYNC", "POSTS_LIKE_BUFFER", "DJANGO_SETTINGS_MODULE"):
+                env.pop(name, None)
+            result = subprocess.run(
+                [sys.executable, "manage.py", "benchmark", "--users", "10", "--posts", "40", "--likes", "60",
+                 "--comments", "20", "--requests", "5", "--warmup", "1", "--noinput", "--output", str(report)],
+                cwd=PROJECT_DIR, env=env, capture_output=True, text=True, timeout=300,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            # failures in background threads are only logged
+            self.assertNotIn("Traceback", result.stderr)
+            endpoints = json.loads(report.read_text())["endpoints"]
+        self.assertEqual(set(endpoints), {"feed", "post_list", "post_detail", "notifications", "like", "comment"})
+        for name, stats in endpoints.items():
+            self.assertEqual(stats["errors"], 0, name)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False)
+class ContentRoundTripTestCase(TestCase):
+    def setUp(self):
+        alice = User.objects.create_user(username="alice", email="alice@example.com", password="alicepass")
+        bob = User.objects.create_user(username="bob", password="bobpass")
+        carol = User.objects.create_user(username="carol")  # no usable password
+        alice.followers.add(bob, carol)
+        bob.followers.add(alice)
+        call_command("reconcile_follow_counts", stdout=StringIO())  # the views keep these in step
+        week_ago = timezone.now() - timedelta(days=7)
+        for i in range(3):
+            post = Post.objects.create(author=alice, title=f"Alice {i}", content="gardening notes")
+            Post.objects.filter(pk=post.pk).update(created_at=week_ago + timedelta(hours=i))
+        post = Post.objects.create(author=bob, title="Bob", content="tomatoes")
+        Comment.objects.create(post=post, author=alice, content="nice")
+        Like.objects.create(post=post, user=alice)
+        Like.objects.create(post=post, user=carol)
+
+    maxDiff = None
+
+    def snapshot(self):
+        return {
+            "users": list(User.objects.order_by("id").values_list(
+                "id", "username", "email", "password", "date_joined", "followers_count", "following_count")),
+            "follows": sorted(User.followers.through.objects.values_list("from_user_id", "to_user_id")),
+            "posts": list(Post.objects.order_by("id").values_list(
+                "id", "author_id", "title", "content", "created_at", "updated_at", "likes_count", "comments_count")),
+            "comments": list(Comment.objects.order_by("id").values_list("id", "post_id", "author_id", "content")),
+            "likes": list(Like.objects.order_by("id").values_list("id", "post_id", "user_id")),
+            "feed": sorted(FeedEntry.objects.values_list("user_id", "post_id")),
+        }
+
+    def export(self, path, *args):
+        call_command("export_content", "--passwords", "--chunk-size", "2", "--output", str(path), *args,
+                     stdout=StringIO())
+
+    def load(self, path, *args):
+        call_command("import_content", str(path), "--workers", "1", "--batch-size", "2", *args, stdout=StringIO())
+
+    def test_export_then_import_into_a_clean_database(self):
+        before = self.snapshot()
+        with tempfile.TemporaryDirectory() as tmp:
+            dump = Path(tmp) / "dump.ndjson.gz"
+            self.export(dump, "--gzip")
+            User.objects.all().delete()
+            self.assertFalse(Post.objects.exists())
+            self.load(dump)
+        self.assertEqual(self.snapshot(), before)
+        self.assertTrue(User.objects.get(username="alice").check_password("alicepass"))
+        self.assertFalse(User.objects.get(username="carol").has_usable_password())
+        found = get_backend().search(Post.objects.all(), "tomatoes")
+        self.assertEqual(list(found.values_list("title", flat=True)), ["Bob"])
+        # the sequences continue after the imported ids
+        self.assertGreater(Post.objects.create(author_id=before["users"][0][0], title="New", content="x").id,
+                           before["posts"][-1][0])
+
+    def test_skip_existing_makes_a_rerun_harmless(self):
+        before = self.snapshot()
+        with tempfile.TemporaryDirectory() as tmp:
+            dump = Path(tmp) / "dump.ndjson"
+            self.export(dump)
+            self.load(dump, "--skip-existing")
+        self.assertEqual(self.snapshot(), before)
+
+    def test_rejects_malformed_records(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dump = Path(tmp) / "dump.ndjson"
+            dump.write_text('{"type": "user", "id": 1, "username": "x"}\n{"kind": "post"}\n')
+            with self.assertRaisesMessage(CommandError, "Line 2: not an export record"):
+                self.load(dump)
@@ -0,0 +1,76 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from accounts.models import User
+from . import feed
+from .models import FeedEntry, Post
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False, FEED_FANOUT_MAX_FOLLOWERS=1)
+class HybridFeedTestCase(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        self.small = User.objects.create_user(username="small", password="testpass")
+        self.popular = User.objects.create_user(username="popular", password="testpass")
+
+    def follow(self, user, author):
+        self.client.force_authenticate(user)
+        self.client.post(reverse("follow-user", args=[author.id]))
+
+    def unfollow(self, user, author):
+        self.client.force_authenticate(user)
+        self.client.post(reverse("unfollow-user", args=[author.id]))
+
+    def feed_ids(self):
+        self.client.force_authenticate(self.reader)
+        return [item["id"] for item in self.client.get(reverse("feed")).data["results"]]
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        old = Post.objects.create(author=self.small, title="Old", content="content")
+        self.follow(self.reader, self.small)
+        new = Post.objects.create(author=self.small, title="New", content="content")
+        self.assertEqual(self.feed_ids(), [new.id, old.id])
+        self.unfollow(self.reader, self.small)
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_high_follower_posts_are_merged_on_read(self):
+        self.follow(self.reader, self.small)
+        self.follow(self.reader, self.popular)
+        self.follow(self.other, self.popular)
+        first = Post.objects.create(author=self.small, title="First", content="content")
+        pulled = Post.objects.create(author=self.popular, title="Pulled", content="content")
+        last = Post.objects.create(author=self.small, title="Last", content="content")
+        self.assertFalse(Post.objects.get(pk=pulled.pk).fanned_out)
+        self.assertFalse(FeedEntry.objects.filter(post=pulled).exists())
+        self.assertEqual(self.feed_ids(), [last.id, pulled.id, first.id])
+
+    def test_author_crossing_the_threshold_keeps_every_post(self):
+        self.follow(self.reader, self.popular)
+        fanned = Post.objects.create(author=self.popular, title="Fanned", content="content")
+        self.follow(self.other, self.popular)
+        pulled = Post.objects.create(author=self.popular, title="Pulled", content="content")
+        self.assertTrue(Post.objects.get(pk=fanned.pk).fanned_out)
+        self.assertFalse(Post.objects.get(pk=pulled.pk).fanned_out)
+        self.assertEqual(self.feed_ids(), [pulled.id, fanned.id])
+
+        self.unfollow(self.other, self.popular)
+        self.assertEqual(feed.pulled_authors(self.reader), [])
+        self.assertEqual(self.feed_ids(), [pulled.id, fanned.id])
+
+    def test_reconcile_fans_out_pulled_posts(self):
+        self.follow(self.reader, self.popular)
+        self.follow(self.other, self.popular)
+        pulled = Post.objects.create(author=self.popular, title="Pulled", content="content")
+        # the follow is removed behind the views' back, e.g. in the admin
+        self.popular.followers.remove(self.other)
+        call_command("reconcile_follow_counts", stdout=StringIO())
+        self.assertTrue(Post.objects.get(pk=pulled.pk).fanned_out)
+        self.assertEqual(
+            list(FeedEntry.objects.filter(post=pulled).values_list("user_id", flat=True)), [self.reader.id]
+        )
+        self.assertEqual(self.feed_ids(), [pulled.id])
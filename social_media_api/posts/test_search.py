@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from accounts.models import User
+from .models import Post
+from .search import SQLiteSearchBackend, get_backend
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False)
+class PostSearchTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="author", password="testpass")
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get(reverse("post-search"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.data["results"]]
+
+    def test_title_matches_rank_above_content_matches(self):
+        in_content = Post.objects.create(author=self.user, title="Weekend", content="Went hiking again")
+        in_title = Post.objects.create(author=self.user, title="Hiking", content="Up the hill")
+        Post.objects.create(author=self.user, title="Unrelated", content="Nothing here")
+        self.assertEqual(self.search("hiking"), [in_title.id, in_content.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        response = self.client.post(reverse("post-list"), {"title": "Sourdough", "content": "Starter notes"})
+        post_id = response.data["id"]
+        self.assertEqual(self.search("sourdough"), [post_id])
+
+        self.client.patch(reverse("post-detail", args=[post_id]), {"title": "Focaccia"})
+        self.assertEqual(self.search("sourdough"), [])
+        self.assertEqual(self.search("focaccia"), [post_id])
+
+        self.client.delete(reverse("post-detail", args=[post_id]))
+        self.assertEqual(self.search("focaccia"), [])
+        if isinstance(get_backend(), SQLiteSearchBackend):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM posts_post_fts WHERE rowid = %s", [post_id])
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_query_syntax_is_not_interpreted(self):
+        post = Post.objects.create(author=self.user, title="C and C++", content="pointers")
+        self.assertEqual(self.search('"pointers ('), [post.id])
+        self.assertEqual(self.client.get(reverse("post-search"), {"q": " "}).status_code, 400)
@@ -0,0 +1,345 @@
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.graph import graph
+from accounts.models import User
+from notifications.models import Notification
+from request_metrics.testing import QueryBudgetMixin
+from . import feed
+from .models import Comment, FeedEntry, Like, Post
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False)
+class PostQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+    Query budgets for the post read endpoints, checked against
+    query_budgets.json at the fixture size and at 10x the data
+    (QUERY_BUDGET_UPDATE=1 re-records the baseline).
+    """
+    query_budget_file = Path(__file__).resolve().parent.parent / "query_budgets.json"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="testpass")
+        self.client.force_authenticate(self.user)
+        self.add_content(1)
+
+    def add_content(self, factor):
+        # new authors the reader follows, each with posts others liked and commented on
+        start = User.objects.count()
+        authors = [User.objects.create_user(username=f"author{start + i}") for i in range(2 * factor)]
+        self.user.following.add(*authors)
+        graph.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3 * factor):
+                author = authors[i % len(authors)]
+                post = Post.objects.create(author=author, title=f"Post {i}", content="content")
+                Like.objects.create(post=post, user=authors[(i + 1) % len(authors)])
+                Comment.objects.create(post=post, author=self.user, content="comment")
+        Like.objects.create(post=post, user=self.user)
+
+    def get(self, url, **params):
+        def request():
+            # measure the uncached path; a cache hit would hide N+1s
+            caches["posts"].clear()
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        return request
+
+    def test_post_list_query_budget(self):
+        self.assertQueryBudgetScales("PostViewSet.list", self.get(reverse("post-list")), self.add_content)
+
+    def test_post_detail_query_budget(self):
+        post = Post.objects.first()
+        self.assertQueryBudgetScales(
+            "PostViewSet.retrieve", self.get(reverse("post-detail", args=[post.id])), self.add_content
+        )
+
+    def test_feed_query_budget(self):
+        self.assertQueryBudgetScales("FeedListAPIView", self.get(reverse("feed")), self.add_content)
+
+    def test_top_feed_query_budget(self):
+        self.assertQueryBudgetScales(
+            "FeedListAPIView?mode=top", self.get(reverse("feed"), mode="top"), self.add_content
+        )
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False)
+class BulkLikeTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="liker", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        author = User.objects.create_user(username="author", password="testpass")
+        self.posts = [Post.objects.create(author=author, title=f"Post {i}", content="content") for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def assertLikeCountsMatch(self):
+        for post in Post.objects.all():
+            self.assertEqual(post.likes_count, Like.objects.filter(post=post).count())
+
+    def test_bulk_unlike_decrements_once(self):
+        post_ids = [post.id for post in self.posts]
+        Like.objects.create(post=self.posts[0], user=self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("post-bulk-like"), {"post_ids": post_ids}, format="json")
+        self.assertEqual(response.data["liked"], post_ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("post-bulk-unlike"), {"post_ids": post_ids}, format="json")
+        self.assertEqual(response.data["unliked"], post_ids)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).likes_count, 1)
+        self.assertLikeCountsMatch()
+
+    def test_repeated_like_counts_actor_once(self):
+        post = self.posts[0]
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("post-like", args=[post.id]))
+                self.client.post(reverse("post-unlike", args=[post.id]))
+        self.client.force_authenticate(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("post-like", args=[post.id]))
+        notification = Notification.objects.get(recipient=post.author, verb="liked your post")
+        self.assertEqual(notification.actor_count, 2)
+
+    def test_bulk_like_counts_only_inserted_likes(self):
+        post_ids = [post.id for post in self.posts]
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(post=self.posts[1], user=self.user)
+            response = self.client.post(reverse("post-bulk-like"), {"post_ids": post_ids + [999999]}, format="json")
+        self.assertEqual(response.data["liked"], [self.posts[0].id, self.posts[2].id])
+        self.assertEqual(response.data["already_liked"], [self.posts[1].id])
+        self.assertEqual(response.data["not_found"], [999999])
+        self.assertLikeCountsMatch()
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False, POSTS_CACHE=True)
+class LikedByMeTestCase(APITestCase):
+    def setUp(self):
+        author = User.objects.create_user(username="author", password="testpass")
+        self.viewer = User.objects.create_user(username="viewer", password="testpass")
+        self.other = User.objects.create_user(username="other", password="testpass")
+        self.liked = Post.objects.create(author=author, title="Liked", content="content")
+        self.other_liked = Post.objects.create(author=author, title="Other", content="content")
+        Like.objects.create(post=self.liked, user=self.viewer)
+        Like.objects.create(post=self.other_liked, user=self.other)
+        caches["posts"].clear()
+
+    def liked_by_me(self, user):
+        self.client.force_authenticate(user)
+        return {item["id"]: item["liked_by_me"] for item in self.client.get(reverse("post-list")).data["results"]}
+
+    def test_shared_page_is_personalized_per_viewer(self):
+        self.assertEqual(self.liked_by_me(self.viewer), {self.liked.id: True, self.other_liked.id: False})
+        # the second viewer is served the cached page
+        self.assertEqual(self.liked_by_me(self.other), {self.liked.id: False, self.other_liked.id: True})
+        self.assertEqual(self.liked_by_me(None), {self.liked.id: False, self.other_liked.id: False})
+
+    def test_likes_resolved_with_one_query_per_page(self):
+        Post.objects.bulk_create(
+            [Post(author=self.other, title=f"Post {i}", content="content") for i in range(8)]
+        )
+        caches["posts"].clear()
+        self.client.force_authenticate(self.viewer)
+        # page, liked_by_me, comments; the page is then cached
+        with self.assertNumQueries(3):
+            self.client.get(reverse("post-list"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("post-list"))
+        self.assertEqual([item["id"] for item in response.data["results"] if item["liked_by_me"]], [self.liked.id])
+
+    def test_detail(self):
+        self.client.force_authenticate(self.viewer)
+        self.assertTrue(self.client.get(reverse("post-detail", args=[self.liked.id])).data["liked_by_me"])
+        self.assertFalse(self.client.get(reverse("post-detail", args=[self.other_liked.id])).data["liked_by_me"])
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False, POSTS_LATEST_COMMENTS=2)
+class LatestCommentsTestCase(APITestCase):
+    def setUp(self):
+        author = User.objects.create_user(username="author", password="testpass")
+        reader = User.objects.create_user(username="reader", password="testpass")
+        reader.following.add(author)
+        self.posts = [Post.objects.create(author=author, title=f"Post {i}", content="content") for i in range(3)]
+        for post in self.posts:
+            for j in range(4):
+                Comment.objects.create(post=post, author=reader, content=f"{post.id}-{j}")
+        self.client.force_authenticate(reader)
+
+    def test_latest_embeds_newest_comments_and_link(self):
+        for url in (reverse("post-list"), reverse("feed")):
+            response = self.client.get(url, {"comments": "latest"})
+            for item in response.data["results"]:
+                self.assertEqual([c["content"] for c in item["comments"]], [f"{item['id']}-3", f"{item['id']}-2"])
+                self.assertEqual(item["comments_count"], 4)
+                self.assertTrue(item["comments_url"].endswith(reverse("post-comments", args=[item["id"]])))
+
+    def test_default_embeds_every_comment(self):
+        item = self.client.get(reverse("post-list")).data["results"][0]
+        self.assertEqual(len(item["comments"]), 4)
+        self.assertNotIn("comments_url", item)
+
+    def test_latest_comments_query_count_does_not_grow(self):
+        caches["posts"].clear()
+        # page, liked_by_me, one windowed comments query
+        with self.assertNumQueries(3):
+            self.client.get(reverse("post-list"), {"comments": "latest"})
+
+    def test_comments_endpoint_pages_oldest_first(self):
+        post = self.posts[0]
+        response = self.client.get(reverse("post-comments", args=[post.id]))
+        self.assertEqual([c["content"] for c in response.data["results"]], [f"{post.id}-{j}" for j in range(4)])
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False)
+class FeedFanOutTestCase(APITestCase):
+    def test_fan_out_reaches_follower_unknown_to_cached_graph(self):
+        author = User.objects.create_user(username="author", password="testpass")
+        follower = User.objects.create_user(username="follower", password="testpass")
+        graph.followers_of(author.id)  # this worker's copy predates the follow
+        author.followers.add(follower)
+        post = Post.objects.create(author=author, title="Post", content="content")
+        self.assertEqual(list(FeedEntry.objects.filter(user=follower).values_list("post_id", flat=True)), [post.id])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_pulled_posts_absorbed_when_author_drops_below_threshold(self):
+        author = User.objects.create_user(username="author", password="testpass")
+        reader = User.objects.create_user(username="reader", password="testpass")
+        other = User.objects.create_user(username="other", password="testpass")
+        self.client.force_authenticate(other)
+        self.client.post(reverse("follow-user", args=[author.id]))
+        self.client.force_authenticate(reader)
+        self.client.post(reverse("follow-user", args=[author.id]))
+        post = Post.objects.create(author=author, title="Post", content="content")
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        self.client.force_authenticate(other)
+        self.client.post(reverse("unfollow-user", args=[author.id]))
+        post.refresh_from_db()
+        self.assertTrue(post.fanned_out)
+        self.assertEqual(list(FeedEntry.objects.filter(post=post).values_list("user_id", flat=True)), [reader.id])
+        self.assertEqual(feed.pulled_authors(reader), [])
+        self.client.force_authenticate(reader)
+        response = self.client.get(reverse("feed"))
+        self.assertEqual([item["id"] for item in response.data["results"]], [post.id])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_pulled_authors_lists_high_follower_and_pulled_posts(self):
+        high = User.objects.create_user(username="high", password="testpass")
+        former = User.objects.create_user(username="former", password="testpass")
+        reader = User.objects.create_user(username="reader", password="testpass")
+        other = User.objects.create_user(username="other", password="testpass")
+        high.followers.add(reader, other)
+        former.followers.add(reader)
+        User.objects.filter(pk=high.pk).update(followers_count=2)
+        User.objects.filter(pk=former.pk).update(followers_count=1)
+        Post.objects.create(author=former, title="Post", content="content", fanned_out=False)
+        with self.assertNumQueries(1):
+            self.assertEqual(sorted(feed.pulled_authors(reader)), sorted([high.id, former.id]))
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False, POSTS_CACHE=True)
+class TopFeedSnapshotTestCase(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", password="testpass")
+        author = User.objects.create_user(username="author", password="testpass")
+        author.followers.add(self.reader)
+        self.posts = [Post.objects.create(author=author, title=f"Post {i}", content="content") for i in range(12)]
+        for rank, post in enumerate(self.posts):
+            Post.objects.filter(pk=post.pk).update(score=100 - rank)
+        self.client.force_authenticate(self.reader)
+
+    def test_rescored_post_is_neither_repeated_nor_skipped(self):
+        first = self.client.get(reverse("feed"), {"mode": "top"})
+        self.assertEqual([item["id"] for item in first.data["results"]], [post.id for post in self.posts[:10]])
+        # the last post overtakes everything while the reader is on page one
+        Post.objects.filter(pk=self.posts[-1].pk).update(score=1000)
+        second = self.client.get(first.data["next"])
+        self.assertEqual([item["id"] for item in second.data["results"]], [post.id for post in self.posts[10:]])
+        self.assertIsNone(second.data["next"])
+        previous = self.client.get(second.data["previous"])
+        self.assertEqual(previous.data["results"], first.data["results"])
+
+    def test_expired_snapshot_is_not_found(self):
+        first = self.client.get(reverse("feed"), {"mode": "top"})
+        caches["default"].clear()
+        self.assertEqual(self.client.get(first.data["next"]).status_code, 404)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False, FEED_RANKING_ASYNC=False, POSTS_LIKE_BUFFER=False,
+                   SECURE_SSL_REDIRECT=False)
+class PostCacheTestCase(APITestCase):
+    def test_lost_version_does_not_revalidate_stale_etag(self):
+        user = User.objects.create_user(username="reader", password="testpass")
+        post = Post.objects.create(author=user, title="Post", content="content")
+        self.client.force_authenticate(user)
+        url = reverse("post-detail", args=[post.id])
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("post-like", args=[post.id]))
+        caches["posts"].clear()
+        caches["default"].delete(f"posts:version:{post.id}")  # evicted
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["likes_count"], 1)
+
+    def test_lost_modified_time_does_not_fall_back_to_updated_at(self):
+        user = User.objects.create_user(username="reader", password="testpass")
+        post = Post.objects.create(author=user, title="Post", content="content")
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Post.objects.filter(pk=post.pk).update(updated_at=an_hour_ago)
+        caches["default"].set(f"posts:modified:{post.id}", an_hour_ago.timestamp(), None)
+        self.client.force_authenticate(user)
+        url = reverse("post-detail", args=[post.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("post-like", args=[post.id]))
+        caches["default"].delete(f"posts:modified:{post.id}")  # evicted
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["likes_count"], 1)
+
+    @override_settings(POSTS_CACHE_MARKER_TIMEOUT=60, POSTS_CACHE_TIMEOUT=30)
+    def test_markers_expire(self):
+        caches["default"].clear()
+        user = User.objects.create_user(username="reader", password="testpass")
+        post = Post.objects.create(author=user, title="Post", content="content")
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("post-like", args=[post.id]))
+        keys = [f"posts:version:{post.id}", f"posts:modified:{post.id}", "posts:generation", "posts:modified"]
+        self.assertEqual(len(caches["default"].get_many(keys)), 4)
+        later = time.time() + 61
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertEqual(caches["default"].get_many(keys), {})
+
+    @override_settings(POSTS_CACHE=False)
+    def test_disabled_cache_sends_no_validators(self):
+        user = User.objects.create_user(username="reader", password="testpass")
+        post = Post.objects.create(author=user, title="Post", content="content")
+        response = self.client.get(reverse("post-detail", args=[post.id]))
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ExportStreamTestCase(TestCase):
+    async def test_asgi_export_streams_asynchronously(self):
+        user = await sync_to_async(User.objects.create_user)(username="exporter", password="testpass")
+        for i in range(3):
+            await Post.objects.acreate(author=user, title=f"Post {i}", content="content")
+        token = await Token.objects.acreate(user=user)
+        response = await AsyncClient().get(reverse("post-export"), headers={"Authorization": f"Token {token.key}"})
+        self.assertTrue(response.is_async)
+        body = b"".join([block async for block in response.streaming_content])
+        self.assertEqual(len(body.splitlines()), 4)  # the user and three posts
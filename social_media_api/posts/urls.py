@@ -1,12 +1,20 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import PostViewSet, CommentViewSet, LikePostAPIView, UnlikePostAPIView, FeedListAPIView
+from .views import (
+    PostViewSet, CommentViewSet, LikePostAPIView, UnlikePostAPIView, FeedListAPIView,
+    BulkLikeAPIView, BulkUnlikeAPIView, LikedStatusAPIView, ExportAPIView,
+)
 
 router = DefaultRouter()
 router.register(r"posts", PostViewSet, basename="post")
 router.register(r"comments", CommentViewSet, basename="comment")
 
 urlpatterns = [
+    # before the router, whose posts/<pk>/ route would otherwise match these
+    path("posts/bulk-like/", BulkLikeAPIView.as_view(), name="post-bulk-like"),
+    path("posts/bulk-unlike/", BulkUnlikeAPIView.as_view(), name="post-bulk-unlike"),
+    path("posts/liked/", LikedStatusAPIView.as_view(), name="post-liked-status"),
+    path("posts/export/", ExportAPIView.as_view(), name="post-export"),
     path("", include(router.urls)),
     path("posts/<int:pk>/like/", LikePostAPIView.as_view(), name="post-like"),
     path("posts/<int:pk>/unlike/", UnlikePostAPIView.as_view(), name="post-unlike"),
@@ -2,32 +2,132 @@ from rest_framework import viewsets, permissions, filters, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
-from django.contrib.contenttypes.models import ContentType
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max, Prefetch
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from datetime import timedelta
 
 from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer, LikeSerializer
+from .serializers import PostSerializer, LatestCommentsPostSerializer, CommentSerializer, LikeSerializer, PostIdsSerializer
 from .permissions import IsOwnerOrReadOnly
-from notifications.models import Notification
+from .pagination import (
+    PostCursorPagination, FeedCursorPagination, TopFeedCursorPagination, TopFeedSnapshotPagination,
+    CommentCursorPagination,
+)
+from . import feed
+from .buffer import like_counter
+from . import cache as post_cache
+from .search import get_backend
+from . import export
+from notifications.dispatch import notify
+from social_media_api.conditional import conditional, make_etag
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class CommentsModeMixin:
+    """
+    Reads of posts embed every comment by default. ``?comments=latest`` embeds
+    only the newest POSTS_LATEST_COMMENTS per post, fetched for the whole page
+    with one windowed prefetch, plus a link to the paginated comments action.
+    """
+
+    def latest_comments_only(self):
+        return self.request.method == "GET" and self.request.query_params.get("comments") == "latest"
+
+    def get_serializer_class(self):
+        if self.latest_comments_only():
+            return LatestCommentsPostSerializer
+        return super().get_serializer_class()
+
+    def prefetch_comments(self, queryset):
+        comments = Comment.objects.select_related("author")
+        if self.latest_comments_only():
+            latest = comments.order_by("-created_at", "-id")[: settings.POSTS_LATEST_COMMENTS]
+            return queryset.prefetch_related(Prefetch("comments", queryset=latest, to_attr="latest_comments"))
+        return queryset.prefetch_related(Prefetch("comments", queryset=comments))
+
+
+class PostViewSet(CommentsModeMixin, viewsets.ModelViewSet):
     """
     list, retrieve, create, update, partial_update, destroy
-    Supports search by title/content and ordering.
+    Supports search by title/content and ordering; ``search/?q=`` is the
+    ranked full-text search.
     """
-    queryset = Post.objects.all().select_related("author").prefetch_related("comments")
+    queryset = Post.objects.all().select_related("author")
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    pagination_class = PostCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = []  # e.g., ["author__username"]
     search_fields = ["title", "content"]
-    ordering_fields = ["created_at", "updated_at"]
+    ordering_fields = ["created_at", "updated_at", "score"]
+
+    def get_queryset(self):
+        return self.prefetch_comments(super().get_queryset())
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ("list", "retrieve"):
+            # cached representations are shared; liked_by_me is overlaid per viewer
+            context["liked_post_ids"] = set()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        generation, modified = post_cache.lists_state()
+        variant = self.get_serializer_class().__name__
+
+        def render():
+            key = post_cache.page_key(request, generation, variant)
+            data = post_cache.get(key)
+            if data is None:
+                data = super(PostViewSet, self).list(request, *args, **kwargs).data
+                post_cache.store(key, data)
+            return Response({**data, "results": post_cache.overlay_liked_by_me(data["results"], request.user)})
+
+        if not post_cache.enabled():
+            return render()
+        return conditional(request, render, make_etag(request, "posts", generation), modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        post_id = kwargs[lookup]
+        updated_at = generics.get_object_or_404(Post.objects.values_list("updated_at", flat=True), pk=post_id)
+        version, modified = post_cache.post_state(post_id)
+        variant = self.get_serializer_class().__name__
+
+        def render():
+            key = post_cache.body_key(post_id, updated_at, version, variant)
+            data = post_cache.get(key)
+            if data is None:
+                data = super(PostViewSet, self).retrieve(request, *args, **kwargs).data
+                post_cache.store(key, data)
+            return Response(post_cache.overlay_liked_by_me([data], request.user)[0])
+
+        if not post_cache.enabled():
+            return render()
+        last_modified = max(updated_at.timestamp(), modified)
+        return conditional(request, render, make_etag(request, "post", updated_at, version), last_modified)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    @action(detail=True, methods=["get"], permission_classes=[permissions.AllowAny])
+    @action(detail=False, methods=["get"], pagination_class=PageNumberPagination)
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"detail": "Missing q parameter"}, status=status.HTTP_400_BAD_REQUEST)
+        posts = get_backend().search(self.get_queryset(), query)
+        page = self.paginate_queryset(posts)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=["get"], permission_classes=[permissions.AllowAny],
+            pagination_class=CommentCursorPagination)
     def comments(self, request, pk=None):
         post = self.get_object()
         comments = post.comments.all()
@@ -54,19 +154,45 @@ class CommentViewSet(viewsets.ModelViewSet):
         serializer.save(author=self.request.user)
 
 
-class FeedListAPIView(generics.ListAPIView):
+class FeedListAPIView(CommentsModeMixin, generics.ListAPIView):
+    """
+    Home feed, newest first. ``?mode=top`` instead ranks the last
+    FEED_RANKING_WINDOW_DAYS of the feed by the precomputed Post.score.
+    """
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def top_mode(self):
+        return self.request.query_params.get("mode") == "top"
+
+    @property
+    def pagination_class(self):
+        if not self.top_mode():
+            return FeedCursorPagination
+        # snapshots have to be visible to whichever worker serves the next page
+        return TopFeedSnapshotPagination if post_cache.enabled() else TopFeedCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        # a first top page starts a new snapshot, so a cached copy would point
+        # the client at one that may have expired
+        first_top_page = self.top_mode() and "snapshot" not in request.query_params
+        if not post_cache.enabled() or first_top_page:
+            return super().list(request, *args, **kwargs)
+        # new posts, likes and comments bump the posts generation; follows
+        # and unfollows change which authors the feed draws from
+        generation, _ = post_cache.lists_state()
+        # every follow inserts a row with a new highest id and every unfollow
+        # lowers the count, so the pair changes whenever the followed set does
+        following = feed.Follow.objects.filter(to_user=request.user).aggregate(n=Count("id"), last=Max("id"))
+        etag = make_etag(request, "feed", generation, following["n"], following["last"])
+        return conditional(request, lambda: super(FeedListAPIView, self).list(request, *args, **kwargs), etag)
+
     def get_queryset(self):
-        user = self.request.user
-        following_users = user.following.all()
-        return (
-            .Post.objects.filter(author__in=following_users).order_by
-            .select_related("author")
-            .prefetch_related("comments")
-            .order_by("-created_at")
-        )
+        queryset = feed.feed_queryset(self.request.user).select_related("author")
+        if self.top_mode():
+            since = timezone.now() - timedelta(days=settings.FEED_RANKING_WINDOW_DAYS)
+            queryset = queryset.filter(feed_at__gte=since).order_by("-score", "-id")
+        return self.prefetch_comments(queryset)
 
 
 class LikePostAPIView(APIView):
@@ -78,13 +204,12 @@ class LikePostAPIView(APIView):
         if not created:
             return Response({"detail": "Already liked"}, status=status.HTTP_400_BAD_REQUEST)
 
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
+        if post.author_id != request.user.id:
+            notify(
+                recipient_id=post.author_id,
+                actor_id=request.user.id,
                 verb="liked your post",
-                target_content_type=ContentType.objects.get_for_model(post),
-                target_object_id=str(post.id),
+                target=post,
             )
 
         serializer = LikeSerializer(like, context={"request": request})
@@ -100,3 +225,139 @@ class UnlikePostAPIView(APIView):
         if deleted == 0:
             return Response({"detail": "You have not liked this post"}, status=status.HTTP_400_BAD_REQUEST)
         return Response({"detail": "Unliked"}, status=status.HTTP_200_OK)
+
+
+def _insert_likes(user_id, post_ids):
+    """
+    Insert the user's likes of ``post_ids`` that don't exist yet, without the
+    Like signals, and return the post ids whose like was actually inserted.
+    """
+    if not post_ids:
+        return []
+    if connection.vendor in ("postgresql", "sqlite") and connection.features.can_return_rows_from_bulk_insert:
+        qn = connection.ops.quote_name
+        created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+        sql = (
+            f"INSERT INTO {qn(Like._meta.db_table)} ({qn('post_id')}, {qn('user_id')}, {qn('created_at')}) "
+            f"VALUES {', '.join(['(%s, %s, %s)'] * len(post_ids))} "
+            f"ON CONFLICT ({qn('post_id')}, {qn('user_id')}) DO NOTHING RETURNING {qn('post_id')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [value for post_id in post_ids for value in (post_id, user_id, created_at)])
+            return [post_id for post_id, in cursor.fetchall()]
+    created = []
+    for post_id in post_ids:
+        try:
+            with transaction.atomic():
+                Like.objects.bulk_create([Like(user_id=user_id, post_id=post_id)])
+        except IntegrityError:
+            continue
+        created.append(post_id)
+    return created
+
+
+class BulkLikeAPIView(APIView):
+    """
+    Like many posts at once: ``{"post_ids": [...]}``. Missing posts and posts
+    already liked are reported rather than failing the batch.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = PostIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        post_ids = serializer.validated_data["post_ids"]
+
+        with transaction.atomic():
+            authors = dict(Post.objects.filter(id__in=post_ids).order_by().values_list("id", "author_id"))
+            # only likes this request inserted count: a concurrent like of the
+            # same post makes its insert a no-op
+            created = set(_insert_likes(request.user.id, [post_id for post_id in post_ids if post_id in authors]))
+            liked = [post_id for post_id in post_ids if post_id in created]
+            already = set(authors) - created
+            # the inserts skip the Like signals, so counters, scores and
+            # caches are updated here for the whole batch
+            like_counter.add_many(liked, 1)
+            post_cache.touch_many(liked)
+
+        for post_id in liked:
+            if authors[post_id] != request.user.id:
+                notify(recipient_id=authors[post_id], actor_id=request.user.id, verb="liked your post",
+                       target=Post(pk=post_id))
+
+        return Response({
+            "liked": liked,
+            "already_liked": [post_id for post_id in post_ids if post_id in already],
+            "not_found": [post_id for post_id in post_ids if post_id not in authors],
+        })
+
+
+class BulkUnlikeAPIView(APIView):
+    """Unlike many posts at once: ``{"post_ids": [...]}``."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = PostIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        post_ids = serializer.validated_data["post_ids"]
+
+        with transaction.atomic():
+            likes = Like.objects.filter(user=request.user, post_id__in=post_ids).order_by()
+            # lock the rows so a concurrent unlike can't decrement twice
+            unliked = list(likes.select_for_update().values_list("post_id", flat=True))
+            # post_delete updates each counter and cached post
+            likes.filter(post_id__in=unliked).delete()
+
+        unliked = set(unliked)
+        return Response({
+            "unliked": [post_id for post_id in post_ids if post_id in unliked],
+            "not_liked": [post_id for post_id in post_ids if post_id not in unliked],
+        })
+
+
+class LikedStatusAPIView(APIView):
+    """``GET ?ids=1,2,3``: which of these posts the current user has liked."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        ids = [value for value in request.query_params.get("ids", "").split(",") if value]
+        serializer = PostIdsSerializer(data={"post_ids": ids})
+        serializer.is_valid(raise_exception=True)
+        post_ids = serializer.validated_data["post_ids"]
+        liked = set(
+            Like.objects.filter(user=request.user, post_id__in=post_ids)
+            .order_by().values_list("post_id", flat=True)
+        )
+        return Response({"liked": [post_id for post_id in post_ids if post_id in liked]})
+
+
+class ExportAPIView(APIView):
+    """
+    ``GET ?output=ndjson|csv&scope=me|all&compress=gzip``: stream content as
+    export records (see posts.export). ``scope=all`` dumps the whole site and
+    is limited to staff.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        output = request.query_params.get("output", "ndjson")
+        scope = request.query_params.get("scope", "me")
+        compress = request.query_params.get("compress") == "gzip"
+        if output not in export.FORMATS:
+            raise ValidationError({"output": f"Choose one of: {', '.join(export.FORMATS)}."})
+        if scope not in ("me", "all"):
+            raise ValidationError({"scope": "Choose me or all."})
+        if scope == "all" and not request.user.is_staff:
+            raise PermissionDenied("Only staff can export all content.")
+
+        _, content_type, extension = export.FORMATS[output]
+        filename = f"{request.user.username if scope == 'me' else 'all'}.{extension}"
+        if compress:
+            content_type, filename = "application/gzip", f"{filename}.gz"
+        blocks = export.export(output, compress, user=request.user if scope == "me" else None)
+        if isinstance(request._request, ASGIRequest):
+            # a sync iterator would be drained into memory by the ASGI handler
+            blocks = export.aiterate(blocks)
+        response = StreamingHttpResponse(blocks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
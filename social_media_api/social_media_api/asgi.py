@@ -1 +1,18 @@
+"""
+ASGI config for social_media_api project.
 
+It exposes the ASGI callable as a module-level variable named ``application``.
+Long-lived responses such as the notification stream need this entry point.
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
+
+application = get_asgi_application()
+
+# build the follow graph now rather than on the first request
+from accounts.graph import graph  # noqa: E402
+
+graph.warm()
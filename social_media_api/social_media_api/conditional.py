@@ -0,0 +1,39 @@
+"""
+Conditional GET for the read endpoints.
+
+Views derive an ETag (and, where a timestamp covers every change, a
+Last-Modified) from counters and timestamps they can read without building
+the response, then hand ``conditional()`` a callable that builds it. A
+matching ``If-None-Match`` / ``If-Modified-Since`` gets a 304 before any of
+the list or serializer queries run.
+"""
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """
+    Weak ETag over ``parts`` plus everything else the body depends on: the
+    URL, the viewer and the negotiated format.
+    """
+    parts = (request.get_full_path(), request.user.pk, request.accepted_renderer.format) + parts
+    return 'W/"{}"'.format(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def conditional(request, render, etag=None, last_modified=None):
+    if isinstance(last_modified, datetime):
+        last_modified = last_modified.timestamp()
+    if last_modified is not None:
+        last_modified = int(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified) or render()
+    if response.status_code in (200, 304):
+        if etag:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        # representations differ per viewer (liked_by_me, followed_by_me, ...)
+        patch_vary_headers(response, ("Authorization", "Cookie"))
+    return response
@@ -1,9 +1,13 @@
 import os
+import sys
+import tempfile
 from pathlib import Path
 from decouple import config
 import dj_database_url
 
 BASE_DIR = Path(__file__).resolve().parent.parent
+# shared request_metrics package at the repository root
+sys.path.insert(0, str(BASE_DIR.parent))
 
 # Security
 SECRET_KEY = config("SECRET_KEY", default="unsafe-secret-key")
@@ -35,6 +39,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "request_metrics.middleware.RequestMetricsMiddleware",  # first, so it times the whole stack
+    "request_metrics.profiler.SamplingProfilerMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # For serving static files
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -64,6 +70,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "social_media_api.wsgi.application"
+ASGI_APPLICATION = "social_media_api.asgi.application"
 
 DATABASES = {
     "default": dj_database_url.config(
@@ -75,6 +82,44 @@ DATABASES = {
     )
 }
 
+# Counters and caches must be shared by all workers in production: set
+# REDIS_URL there. Without it each process keeps its own local-memory cache.
+# The "posts" alias holds cached post representations (posts.cache); the
+# local-memory backend evicts least recently used entries past MAX_ENTRIES.
+# Their version counters live in "default". Per-process counters disagree
+# between workers, so whatever relies on them (POSTS_CACHE, SOCIAL_GRAPH_INDEX)
+# defaults to off with several workers and no Redis.
+REDIS_URL = config("REDIS_URL", default="")
+SHARED_CACHE = bool(REDIS_URL) or config("WEB_CONCURRENCY", default=1, cast=int) == 1
+POSTS_CACHE = config("POSTS_CACHE", default=SHARED_CACHE, cast=bool)
+POSTS_CACHE_TIMEOUT = config("POSTS_CACHE_TIMEOUT", default=600, cast=int)
+# lifetime of the per-post versions and modified times; never shorter than POSTS_CACHE_TIMEOUT
+POSTS_CACHE_MARKER_TIMEOUT = config("POSTS_CACHE_MARKER_TIMEOUT", default=86400, cast=int)
+POSTS_CACHE_MAX_ENTRIES = config("POSTS_CACHE_MAX_ENTRIES", default=10000, cast=int)
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "posts": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "posts",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "posts": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "posts",
+            "OPTIONS": {"MAX_ENTRIES": POSTS_CACHE_MAX_ENTRIES},
+        },
+    }
+
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
@@ -94,6 +139,89 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = "accounts.User"
 
+# Serve follower/following counts from columns on User kept up to date by the
+# follow views. When disabled, list views annotate counts in their query.
+ACCOUNTS_FOLLOW_COUNTERS = config("ACCOUNTS_FOLLOW_COUNTERS", default=True, cast=bool)
+
+# In-memory follow graph (accounts.graph): how often to check the shared
+# generation counter for changes made by other workers, and the maximum age
+# of a copy before it is rebuilt from the database anyway (seconds). Without
+# SOCIAL_GRAPH_INDEX, per-user lists are read on demand and kept
+# SOCIAL_GRAPH_SYNC_INTERVAL seconds instead.
+SOCIAL_GRAPH_INDEX = config("SOCIAL_GRAPH_INDEX", default=SHARED_CACHE, cast=bool)
+SOCIAL_GRAPH_SYNC_INTERVAL = config("SOCIAL_GRAPH_SYNC_INTERVAL", default=1.0, cast=float)
+SOCIAL_GRAPH_MAX_AGE = config("SOCIAL_GRAPH_MAX_AGE", default=3600, cast=int)
+# "People you may know" suggestions kept per user by compute_recommendations
+RECOMMENDATIONS_PER_USER = config("RECOMMENDATIONS_PER_USER", default=20, cast=int)
+
+# Home feed: posts are fanned out on write to followers' feeds, except for
+# authors above this follower count whose posts are merged in on read.
+FEED_FANOUT_MAX_FOLLOWERS = config("FEED_FANOUT_MAX_FOLLOWERS", default=10000, cast=int)
+# Number of recent posts copied into a feed when following someone
+FEED_BACKFILL_LIMIT = config("FEED_BACKFILL_LIMIT", default=200, cast=int)
+# Ranked feed (?mode=top): posts from the last FEED_RANKING_WINDOW_DAYS ordered
+# by Post.score. Ten times the engagement is worth FEED_RANKING_DECAY seconds
+# of recency. Dirty posts are re-scored every FEED_RANKING_INTERVAL seconds.
+FEED_RANKING_DECAY = config("FEED_RANKING_DECAY", default=45000, cast=int)
+FEED_RANKING_WINDOW_DAYS = config("FEED_RANKING_WINDOW_DAYS", default=7, cast=int)
+FEED_RANKING_ASYNC = config("FEED_RANKING_ASYNC", default=True, cast=bool)
+FEED_RANKING_INTERVAL = config("FEED_RANKING_INTERVAL", default=1.0, cast=float)
+# ranked pages are served from a snapshot of the top FEED_TOP_SNAPSHOT_SIZE ids,
+# kept FEED_TOP_SNAPSHOT_TIMEOUT seconds (needs the shared cache, see POSTS_CACHE)
+FEED_TOP_SNAPSHOT_SIZE = config("FEED_TOP_SNAPSHOT_SIZE", default=500, cast=int)
+FEED_TOP_SNAPSHOT_TIMEOUT = config("FEED_TOP_SNAPSHOT_TIMEOUT", default=1800, cast=int)
+# Notifications are written by background worker threads in batches;
+# set NOTIFICATIONS_ASYNC=False to write them inline (e.g. in tests).
+NOTIFICATIONS_ASYNC = config("NOTIFICATIONS_ASYNC", default=True, cast=bool)
+NOTIFICATIONS_WORKERS = config("NOTIFICATIONS_WORKERS", default=2, cast=int)
+NOTIFICATIONS_BATCH_SIZE = config("NOTIFICATIONS_BATCH_SIZE", default=100, cast=int)
+NOTIFICATIONS_FLUSH_INTERVAL = config("NOTIFICATIONS_FLUSH_INTERVAL", default=0.5, cast=float)
+# Events with the same recipient, verb and target within this many seconds
+# are merged into one unread notification that keeps a few sample actors.
+NOTIFICATIONS_COALESCE_WINDOW = config("NOTIFICATIONS_COALESCE_WINDOW", default=3600, cast=int)
+NOTIFICATIONS_SAMPLE_ACTORS = config("NOTIFICATIONS_SAMPLE_ACTORS", default=3, cast=int)
+# Upper bound on how long a cached unread counter may drift before recount
+NOTIFICATIONS_UNREAD_CACHE_TIMEOUT = config("NOTIFICATIONS_UNREAD_CACHE_TIMEOUT", default=300, cast=int)
+# Server-sent events stream (served through ASGI)
+NOTIFICATIONS_PUBSUB_BACKEND = config("NOTIFICATIONS_PUBSUB_BACKEND", default="notifications.pubsub.InProcessPubSub")
+NOTIFICATIONS_STREAM_HEARTBEAT = config("NOTIFICATIONS_STREAM_HEARTBEAT", default=15, cast=float)
+NOTIFICATIONS_STREAM_BACKLOG = config("NOTIFICATIONS_STREAM_BACKLOG", default=100, cast=int)
+NOTIFICATIONS_STREAM_QUEUE_SIZE = config("NOTIFICATIONS_STREAM_QUEUE_SIZE", default=100, cast=int)
+NOTIFICATIONS_STREAM_RETRY_MS = config("NOTIFICATIONS_STREAM_RETRY_MS", default=3000, cast=int)
+
+# request_metrics: /metrics/ is open to these addresses or to "Bearer <token>"
+REQUEST_METRICS_TOKEN = config("REQUEST_METRICS_TOKEN", default="")
+REQUEST_METRICS_ALLOWED_IPS = config("REQUEST_METRICS_ALLOWED_IPS", default="127.0.0.1,::1",
+                                     cast=lambda value: [ip.strip() for ip in value.split(",") if ip.strip()])
+# Sampling profiler: requests sent with "X-Profile: <token>", plus a random
+# REQUEST_PROFILER_RATE fraction, are profiled into REQUEST_PROFILER_DIR
+REQUEST_PROFILER_TOKEN = config("REQUEST_PROFILER_TOKEN", default="")
+REQUEST_PROFILER_RATE = config("REQUEST_PROFILER_RATE", default=0, cast=float)
+REQUEST_PROFILER_INTERVAL = config("REQUEST_PROFILER_INTERVAL", default=0.005, cast=float)
+REQUEST_PROFILER_DIR = config("REQUEST_PROFILER_DIR", default=str(Path(tempfile.gettempdir()) / "request-profiles"))
+REQUEST_PROFILER_KEEP = config("REQUEST_PROFILER_KEEP", default=100, cast=int)
+
+# Comments embedded per post when listing with ?comments=latest
+POSTS_LATEST_COMMENTS = config("POSTS_LATEST_COMMENTS", default=3, cast=int)
+# Like counter changes are buffered per post and flushed every
+# POSTS_LIKE_BUFFER_INTERVAL seconds (posts.buffer); deltas are shared through
+# Redis when REDIS_URL is set. Set POSTS_LIKE_BUFFER=False to write them inline.
+POSTS_LIKE_BUFFER = config("POSTS_LIKE_BUFFER", default=True, cast=bool)
+POSTS_LIKE_BUFFER_INTERVAL = config("POSTS_LIKE_BUFFER_INTERVAL", default=1.0, cast=float)
+POSTS_LIKE_BUFFER_BACKEND = config(
+    "POSTS_LIKE_BUFFER_BACKEND",
+    default="posts.buffer.RedisCounterBackend" if REDIS_URL else "posts.buffer.LocalCounterBackend",
+)
+# Most post ids accepted by one bulk like/unlike/liked-status request
+POSTS_BULK_MAX_IDS = config("POSTS_BULK_MAX_IDS", default=500, cast=int)
+# Full-text search (posts.search). The backend defaults to the one matching the
+# database vendor; POSTS_SEARCH_MAX_RESULTS caps ranked matches on SQLite.
+POSTS_SEARCH_BACKEND = config("POSTS_SEARCH_BACKEND", default="")
+POSTS_SEARCH_CONFIG = config("POSTS_SEARCH_CONFIG", default="english")
+POSTS_SEARCH_MAX_RESULTS = config("POSTS_SEARCH_MAX_RESULTS", default=500, cast=int)
+# Rows read per keyset query by the streaming export (posts.export)
+EXPORT_CHUNK_SIZE = config("EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
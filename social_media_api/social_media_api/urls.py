@@ -8,4 +8,5 @@ urlpatterns = [
     path("api/accounts/", include("accounts.urls")),
     path("api/posts/", include("posts.urls")),
     path("api/notifications/", include("notifications.urls")),
+    path("metrics/", include("request_metrics.urls")),
 ]
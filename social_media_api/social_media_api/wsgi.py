@@ -10,3 +10,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
 
 application = get_wsgi_application()
+
+# build the follow graph now rather than on the first request
+from accounts.graph import graph  # noqa: E402
+
+graph.warm()